@@ -2,12 +2,28 @@
 Export des analyses (matrice de co-occurrence, rapport HTML exemples de localisation).
 """
 
-import csv
+import base64
+import hashlib
+import heapq
+import io
 import os
-from collections import defaultdict
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFont
+
+from pai_2025_outil_etiquetage_radiographies.data_manager import _process_context
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
 if TYPE_CHECKING:
     from pai_2025_outil_etiquetage_radiographies.data_manager import DataManager
 
@@ -29,87 +45,403 @@ PATHOLOGY_ORDER = [
 ]
 
 
-def _cooccurrence_from_csv(csv_path: str) -> tuple:
+_CSV_CHUNK_ROWS = 1_000_000
+# Au-delà de cette taille, le CSV est découpé en plages traitées en parallèle
+_PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+_PARALLEL_RANGE_BYTES = 256 * 1024 * 1024
+
+
+_LABEL_BITS = np.arange(len(PATHOLOGY_ORDER))
+_LABEL_MASK = {p: 1 << i for i, p in enumerate(PATHOLOGY_ORDER)}
+
+
+def _label_masks(
+    chunk: pd.DataFrame, finding_col: str | None, patho_col: str | None
+) -> np.ndarray:
+    """Masque de bits (uint16) des pathologies de chaque ligne d'un bloc du CSV.
+
+    Les valeurs distinctes de la colonne (quelques centaines de combinaisons
+    au plus) sont découpées une seule fois, puis propagées par leur code.
+    """
+    col = finding_col if finding_col is not None else patho_col
+    codes, uniques = pd.factorize(chunk[col].to_numpy(), sort=False)
+    if finding_col is not None:
+        lut = [
+            sum({_LABEL_MASK.get(lbl.strip(), 0) for lbl in raw.split("|")})
+            for raw in uniques
+        ]
+    else:
+        lut = [_LABEL_MASK.get(raw.strip(), 0) for raw in uniques]
+    return np.asarray(lut, dtype=np.uint16)[codes]
+
+
+def _image_masks(images: pd.Series, row_masks: np.ndarray) -> tuple:
+    """(images distinctes, masque uint16 de chacune ; bit i = PATHOLOGY_ORDER[i])."""
+    codes, uniques = pd.factorize(images.to_numpy(), sort=False)
+    masks = np.zeros(len(uniques), dtype=np.uint16)
+    np.bitwise_or.at(masks, codes, row_masks)
+    return uniques, masks
+
+
+def _merge_image_masks(images: list, masks: list) -> tuple:
+    """OU des masques par image sur plusieurs blocs (une image peut y revenir)."""
+    if not images:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.uint16)
+    codes, uniques = pd.factorize(np.concatenate(images), sort=False)
+    merged = np.zeros(len(uniques), dtype=np.uint16)
+    np.bitwise_or.at(merged, codes, np.concatenate(masks))
+    return uniques, merged
+
+
+def _cooccurrence_from_histogram(hist: np.ndarray) -> np.ndarray:
+    """Co-occurrence A^T . A à partir du nombre d'images par masque distinct."""
+    present = np.flatnonzero(hist)
+    bits = ((present[:, None] >> _LABEL_BITS) & 1).astype(np.float64)
+    return (bits.T @ (bits * hist[present][:, None])).astype(np.int64)
+
+
+def _detect_columns(header: list[str]) -> tuple:
+    """Colonnes (image, Finding Labels, Pathology) telles qu'écrites dans l'en-tête."""
+    stripped = {c.strip(): c for c in header}
+    image_col = stripped.get("Image Index", stripped.get("Image", header[0]))
+    finding_col = next(
+        (c for c in header if "finding" in c.lower() and "label" in c.lower()), None
+    )
+    patho_col = stripped.get("Pathology", stripped.get("pathology"))
+    return image_col, finding_col, patho_col
+
+
+class _ByteRange(io.RawIOBase):
+    """Lecture binaire limitée à [start, end) d'un fichier."""
+
+    def __init__(self, path: str, start: int, end: int) -> None:
+        super().__init__()
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._left = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: bytearray) -> int:
+        if self._left <= 0:
+            return 0
+        count = self._f.readinto(memoryview(b)[: self._left])
+        self._left -= count
+        return count
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def _image_masks_range(
+    csv_path: str, start: int, end: int, header: list[str], columns: tuple
+) -> tuple:
+    """(images distinctes, masque de chacune) d'une plage d'octets du CSV.
+
+    Une image peut aussi figurer dans d'autres plages : l'appelant fusionne
+    les résultats par image avant de compter.
+    """
+    image_col, finding_col, patho_col = columns
+    label_col = finding_col if finding_col is not None else patho_col
+    image_parts: list = []
+    mask_parts: list = []
+    if start >= end:
+        return _merge_image_masks(image_parts, mask_parts)
+    # Masques par image de chaque bloc, fusionnés par image à la fin : une image
+    # dont les lignes ne se suivent pas n'est comptée qu'une fois.
+    with (
+        io.BufferedReader(_ByteRange(csv_path, start, end)) as f,
+        pd.read_csv(
+            f,
+            header=None,
+            names=header,
+            usecols=list(dict.fromkeys([image_col, label_col])),
+            dtype=str,
+            keep_default_na=False,
+            engine="c",
+            encoding="utf-8",
+            chunksize=_CSV_CHUNK_ROWS,
+        ) as reader,
+    ):
+        for chunk in reader:
+            chunk = chunk[chunk[image_col] != ""]
+            if chunk.empty:
+                continue
+            images, masks = _image_masks(
+                chunk[image_col], _label_masks(chunk, finding_col, patho_col)
+            )
+            image_parts.append(images)
+            mask_parts.append(masks)
+    return _merge_image_masks(image_parts, mask_parts)
+
+
+def _byte_ranges(csv_path: str, start: int, size: int, parts: int) -> list:
+    """Découpe [start, size) en plages alignées sur des fins de ligne."""
+    bounds = [start]
+    with open(csv_path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(start + (size - start) * i // parts, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:], strict=True))
+
+
+def _sql_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_str(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _mask_histogram_duckdb(
+    csv_path: str, header: list[str], columns: tuple
+) -> np.ndarray:
+    """Histogramme des masques par image calculé par DuckDB (GROUP BY image)."""
+    image_col, finding_col, patho_col = columns
+    img = _sql_ident(image_col)
+    if finding_col is not None:
+        label = f"unnest(string_split({_sql_ident(finding_col)}, '|'))"
+    else:
+        label = _sql_ident(patho_col)
+    bits = ", ".join(f"('{p}', {i})" for i, p in enumerate(PATHOLOGY_ORDER))
+    # Noms imposés (ceux lus par pandas, espaces compris) : DuckDB rognerait
+    # sinon les en-têtes et les colonnes détectées ne correspondraient plus
+    names = ", ".join(_sql_str(c) for c in header)
+    query = f"""
+        WITH bits(p, bit) AS (VALUES {bits}),
+        labels AS (
+            SELECT {img} AS img, trim({label}) AS p
+            FROM read_csv(
+                {_sql_str(csv_path)}, header = true, all_varchar = true,
+                names = [{names}]
+            )
+            WHERE coalesce({img}, '') <> ''
+        ),
+        masks AS (
+            SELECT bit_or(1 << bit) AS mask
+            FROM labels JOIN bits USING (p)
+            GROUP BY img
+        )
+        SELECT mask, count(*) FROM masks GROUP BY mask
+    """
+    hist = np.zeros(1 << len(PATHOLOGY_ORDER), dtype=np.int64)
+    con = duckdb.connect()
+    try:
+        for mask, count in con.execute(query).fetchall():
+            hist[mask] = count
+    finally:
+        con.close()
+    return hist
+
+
+def _cooccurrence_from_csv(csv_path: str) -> tuple[list[str], np.ndarray]:
     labels = list(PATHOLOGY_ORDER)
     n = len(labels)
-    label_to_idx = {p: i for i, p in enumerate(labels)}
-    per_image = defaultdict(set)
-    with open(csv_path, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
-            return labels, [[0] * n for _ in range(n)]
-        fieldnames = [c.strip() for c in reader.fieldnames]
-        has_finding_labels = any(
-            "finding" in c.lower() and "label" in c.lower() for c in fieldnames
-        )
-        if not has_finding_labels:
-            for c in fieldnames:
-                if c.strip() == "Finding Labels":
-                    has_finding_labels = True
-                    break
-        image_col = "Image Index" if "Image Index" in fieldnames else "Image"
-        if image_col not in fieldnames:
-            image_col = fieldnames[0]
-        for row in reader:
-            row = {k.strip(): v for k, v in row.items() if k}
-            img = row.get("Image Index", row.get("Image", row.get(image_col, "")))
-            if not img:
-                continue
-            if has_finding_labels:
-                raw = ""
-                for k, v in row.items():
-                    if "finding" in k.lower() and "label" in k.lower():
-                        raw = v or ""
-                        break
-                if not raw:
-                    raw = row.get("Finding Labels", "")
-                for p in raw.split("|"):
-                    p = p.strip()
-                    if p and p in label_to_idx:
-                        per_image[img].add(p)
-            else:
-                patho = row.get("Pathology", row.get("pathology", "")) or ""
-                patho = patho.strip()
-                if patho and patho in label_to_idx:
-                    per_image[img].add(patho)
-    matrix = [[0] * n for _ in range(n)]
-    for pathologies in per_image.values():
-        for p1 in pathologies:
-            idx1 = label_to_idx[p1]
-            for p2 in pathologies:
-                idx2 = label_to_idx[p2]
-                matrix[idx1][idx2] += 1
+    try:
+        header = list(pd.read_csv(csv_path, nrows=0, engine="c").columns)
+    except pd.errors.EmptyDataError:
+        return labels, np.zeros((n, n), dtype=np.int64)
+    if not header:
+        return labels, np.zeros((n, n), dtype=np.int64)
+    columns = _detect_columns(header)
+    if columns[1] is None and columns[2] is None:
+        return labels, np.zeros((n, n), dtype=np.int64)
+    size = os.path.getsize(csv_path)
+    if duckdb is not None and size >= _PARALLEL_MIN_BYTES:
+        # Gros CSV : jointure/agrégation en C++ plutôt que le pool de processus
+        try:
+            hist = _mask_histogram_duckdb(csv_path, header, columns)
+        except duckdb.Error as e:
+            print(f"DuckDB indisponible pour {csv_path} ({e}), lecture pandas")
+        else:
+            return labels, _cooccurrence_from_histogram(hist)
+    with open(csv_path, "rb") as f:
+        f.readline()
+        data_start = f.tell()
+    workers = os.cpu_count() or 1
+    if size < _PARALLEL_MIN_BYTES or workers < 2:
+        results = [_image_masks_range(csv_path, data_start, size, header, columns)]
+    else:
+        parts = max(workers, -(-(size - data_start) // _PARALLEL_RANGE_BYTES))
+        ranges = _byte_ranges(csv_path, data_start, size, parts)
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=_process_context()
+        ) as pool:
+            futures = [
+                pool.submit(_image_masks_range, csv_path, a, b, header, columns)
+                for a, b in ranges
+            ]
+            results = [future.result() for future in futures]
+    # Fusion par image de toutes les plages (comme le GROUP BY de DuckDB),
+    # puis une image = une entrée de l'histogramme
+    _, masks = _merge_image_masks([r[0] for r in results], [r[1] for r in results])
+    hist = np.bincount(masks, minlength=1 << n).astype(np.int64)
+    return labels, _cooccurrence_from_histogram(hist)
+
+
+# Matrices déjà calculées, conservées d'une session à l'autre
+_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "pai2025"
+)
+# À incrémenter à chaque changement du comptage ou du format : les anciennes
+# matrices ne sont alors plus relues
+_COOC_CACHE_VERSION = 2
+# Nombre de matrices gardées sur disque (les moins récemment utilisées partent)
+_COOC_CACHE_FILES = 16
+
+
+def _prune_cooccurrence_cache() -> None:
+    """Supprime les matrices en trop dans _CACHE_DIR (plus anciennes d'abord)."""
+    files = []
+    for path in _CACHE_DIR.glob("cooc-*.npz"):
+        if path.name.endswith(".tmp.npz"):
+            continue  # Écriture en cours (autre processus)
+        try:
+            files.append((path.stat().st_mtime_ns, path))
+        except OSError:
+            pass
+    files.sort(reverse=True)
+    for _, path in files[_COOC_CACHE_FILES:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=8)
+def _cooccurrence_from_csv_stamped(csv_path: str, mtime_ns: int, size: int) -> tuple:
+    """_cooccurrence_from_csv, relu depuis _CACHE_DIR si le fichier est inchangé."""
+    key = hashlib.blake2b(
+        f"v{_COOC_CACHE_VERSION}:{csv_path}:{mtime_ns}:{size}".encode(),
+        digest_size=8,
+    ).hexdigest()
+    cache_file = _CACHE_DIR / f"cooc-{key}.npz"
+    try:
+        with np.load(cache_file) as data:
+            labels, matrix = data["labels"].tolist(), data["matrix"]
+    except (OSError, KeyError, ValueError):
+        pass
+    else:
+        try:
+            os.utime(cache_file)  # Récemment utilisée : gardée au prochain nettoyage
+        except OSError:
+            pass
+        return labels, matrix
+    labels, matrix = _cooccurrence_from_csv(csv_path)
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Nom propre au processus : deux exports simultanés n'écrivent pas le même
+        tmp = _CACHE_DIR / f"cooc-{key}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, labels=np.array(labels, dtype=str), matrix=matrix)
+        os.replace(tmp, cache_file)
+        _prune_cooccurrence_cache()
+    except OSError:
+        pass  # Cache facultatif (dossier en lecture seule…)
     return labels, matrix
 
 
+def _cached_cooccurrence_from_csv(csv_path: str) -> tuple[list[str], np.ndarray]:
+    """_cooccurrence_from_csv mis en cache tant que le fichier n'a pas changé."""
+    st = os.stat(csv_path)
+    labels, matrix = _cooccurrence_from_csv_stamped(
+        str(Path(csv_path).resolve()), st.st_mtime_ns, st.st_size
+    )
+    return list(labels), matrix.copy()
+
+
+def _write_matrix_csv(
+    filepath: str | Path, labels: list, matrix: list | np.ndarray
+) -> None:
+    """Écrit la matrice (en-tête + une ligne par pathologie) avec np.savetxt."""
+    rows = np.empty((len(labels), len(labels) + 1), dtype=object)
+    rows[:, 0] = labels
+    rows[:, 1:] = np.asarray(matrix, dtype=np.int64).reshape(len(labels), -1)
+    with open(filepath, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
+        np.savetxt(
+            f,
+            rows,
+            fmt="%s",
+            delimiter=",",
+            newline="\r\n",
+            header=",".join([""] + list(labels)),
+            comments="",
+        )
+
+
 def export_cooccurrence_csv(
     data_manager: "DataManager", filepath: str, from_csv_only: bool = True
 ) -> None:
     labels, matrix = data_manager.get_cooccurrence_data(from_csv_only=from_csv_only)
-    with open(filepath, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([""] + labels)
-        for i, row in enumerate(matrix):
-            w.writerow([labels[i]] + row)
+    _write_matrix_csv(filepath, labels, matrix)
+
+
+_heatmap_lock = threading.Lock()
+_heatmap_figure = None
+_heatmap_norm = None
+_mpl = None
+
+
+def _lazy_mpl() -> tuple:
+    """(Figure, matplotlib.colors), importés une seule fois au premier rendu."""
+    global _mpl
+    if _mpl is None:
+        # Figure directe (sans pyplot) : aucun backend GUI n'est sélectionné
+        import matplotlib.colors as mcolors
+        from matplotlib.figure import Figure
+
+        _mpl = (Figure, mcolors)
+    return _mpl
+
+
+def _get_heatmap_figure() -> object:
+    """Figure matplotlib partagée entre les rendus (créée une fois, vidée ensuite)."""
+    global _heatmap_figure
+    if _heatmap_figure is None:
+        Figure, _ = _lazy_mpl()
+        _heatmap_figure = Figure(figsize=(10, 8))
+    _heatmap_figure.clear()
+    return _heatmap_figure
 
 
-def _draw_heatmap(ax: object, labels: list, matrix: list, title: str) -> None:
-    import matplotlib.colors as mcolors
-    import matplotlib.pyplot as plt
-    import numpy as np
+@lru_cache(maxsize=16)
+def _log_norm_bounds(data: bytes, n: int) -> tuple[float, float] | None:
+    """(vmin, vmax) de l'échelle log, par contenu de matrice (None si tout est nul)."""
+    arr = np.frombuffer(data, dtype=np.float64).reshape(n, -1)
+    positive = arr[arr > 0]
+    if positive.size == 0:
+        return None
+    return max(1.0, float(positive.min())), float(positive.max())
 
+
+def _get_log_norm(vmin: float, vmax: float) -> object:
+    """LogNorm réutilisée : les bornes ne sont modifiées que si elles changent."""
+    global _heatmap_norm
+    if _heatmap_norm is None:
+        _, mcolors = _lazy_mpl()
+        _heatmap_norm = mcolors.LogNorm(vmin=vmin, vmax=vmax)
+    elif (_heatmap_norm.vmin, _heatmap_norm.vmax) != (vmin, vmax):
+        _heatmap_norm.vmin = vmin
+        _heatmap_norm.vmax = vmax
+    return _heatmap_norm
+
+
+def _draw_heatmap(
+    ax: object, labels: list, matrix: list | np.ndarray, title: str
+) -> None:
     n = len(labels)
-    arr = np.array(matrix, dtype=float)
-    arr_plot = np.where(arr > 0, arr, np.nan)
-    if not np.any(arr > 0):
-        arr_plot = arr
-        im = ax.imshow(arr_plot, cmap="YlOrRd", aspect="auto", vmin=0, vmax=1)
+    arr = np.asarray(matrix, dtype=float)
+    bounds = _log_norm_bounds(arr.tobytes(), n)
+    if bounds is None:
+        im = ax.imshow(arr, cmap="YlOrRd", aspect="auto", vmin=0, vmax=1)
     else:
-        vmax = float(np.nanmax(arr_plot))
-        vmin = max(1.0, float(np.nanmin(arr_plot)))
-        norm = mcolors.LogNorm(vmin=vmin, vmax=vmax)
+        arr_plot = np.where(arr > 0, arr, np.nan)
+        norm = _get_log_norm(*bounds)
         im = ax.imshow(arr_plot, cmap="YlOrRd", aspect="auto", norm=norm)
-    plt.colorbar(im, ax=ax, label="Co-occurrences (échelle log)")
+    ax.figure.colorbar(im, ax=ax, label="Co-occurrences (échelle log)")
     ax.set_xticks(range(n))
     ax.set_yticks(range(n))
     ax.set_xticklabels(labels, rotation=45, ha="right")
@@ -117,38 +449,128 @@ def _draw_heatmap(ax: object, labels: list, matrix: list, title: str) -> None:
     ax.set_title(title)
 
 
-def export_cooccurrence_heatmap(
-    data_manager: "DataManager", filepath: str, from_csv_only: bool = True
-) -> bool:
-    try:
-        import matplotlib
+@lru_cache(maxsize=8)
+def _heatmap_png(labels: tuple, matrix: tuple, title: str) -> bytes:
+    """Rendu PNG (octets) de la heatmap, mis en cache par contenu de la matrice."""
+    with _heatmap_lock:
+        fig = _get_heatmap_figure()
+        ax = fig.add_subplot()
+        _draw_heatmap(ax, list(labels), np.array(matrix, dtype=np.int64), title)
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=100, bbox_inches="tight")
+    return buf.getvalue()
 
-        matplotlib.use("Agg")
-        import matplotlib.pyplot as plt
-    except ImportError:
-        return False
-    labels, matrix = data_manager.get_cooccurrence_data(from_csv_only=from_csv_only)
+
+# Palette YlOrRd (ColorBrewer, 9 classes) interpolée sur 256 niveaux
+_YLORRD_ANCHORS = np.array(
+    [
+        (255, 255, 204),
+        (255, 237, 160),
+        (254, 217, 118),
+        (254, 178, 76),
+        (253, 141, 60),
+        (252, 78, 42),
+        (227, 26, 28),
+        (189, 0, 38),
+        (128, 0, 38),
+    ],
+    dtype=np.float64,
+)
+_YLORRD_LUT = np.stack(
+    [
+        np.interp(
+            np.linspace(0, 1, 256),
+            np.linspace(0, 1, len(_YLORRD_ANCHORS)),
+            _YLORRD_ANCHORS[:, c],
+        )
+        for c in range(3)
+    ],
+    axis=1,
+).astype(np.uint8)
+_HEATMAP_CELL = 40
+
+
+@lru_cache(maxsize=8)
+def _heatmap_png_pillow(labels: tuple, matrix: tuple, title: str) -> bytes:
+    """Heatmap PNG (échelle log, cases nulles en blanc) dessinée avec Pillow."""
+    arr = np.array(matrix, dtype=np.float64).reshape(len(labels), len(labels))
+    positive = arr > 0
+    levels = np.zeros(arr.shape, dtype=np.uint8)
+    if positive.any():
+        vmax = float(arr[positive].max())
+        vmin = max(1.0, float(arr[positive].min()))
+        if vmax > vmin:
+            t = (np.log(np.clip(arr, vmin, vmax)) - np.log(vmin)) / (
+                np.log(vmax) - np.log(vmin)
+            )
+            levels = np.round(t * 255).astype(np.uint8)
+    rgb = _YLORRD_LUT[levels]
+    if positive.any():
+        rgb[~positive] = 255
+    cell = _HEATMAP_CELL
+    grid = np.repeat(np.repeat(rgb, cell, axis=0), cell, axis=1)
+
+    font = ImageFont.load_default()
+    measure = ImageDraw.Draw(Image.new("L", (1, 1)))
+    text_w = max((measure.textlength(lbl, font=font) for lbl in labels), default=0)
+    margin_left = int(text_w) + 12
+    margin_top = 32
+    margin_bottom = int(text_w) + 12
     n = len(labels)
-    if n == 0:
-        return False
-    fig, ax = plt.subplots(figsize=(10, 8))
-    _draw_heatmap(
-        ax,
-        labels,
-        matrix,
+    img = Image.new(
+        "RGB",
+        (margin_left + n * cell + 12, margin_top + n * cell + margin_bottom),
+        "white",
+    )
+    img.paste(Image.fromarray(grid), (margin_left, margin_top))
+    draw = ImageDraw.Draw(img)
+    draw.text((margin_left, 8), title, fill="black", font=font)
+    for i, lbl in enumerate(labels):
+        y = margin_top + i * cell + cell // 2
+        draw.text((margin_left - 6, y), lbl, fill="black", font=font, anchor="rm")
+        tag = Image.new("L", (int(measure.textlength(lbl, font=font)) + 2, 14), 255)
+        ImageDraw.Draw(tag).text((0, 1), lbl, fill=0, font=font)
+        tag = tag.rotate(90, expand=True)
+        x = margin_left + i * cell + (cell - tag.width) // 2
+        img.paste(
+            (0, 0, 0), (x, margin_top + n * cell + 6), tag.point(lambda v: 255 - v)
+        )
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def _matrix_key(matrix: list | np.ndarray) -> tuple:
+    return tuple(map(tuple, np.asarray(matrix, dtype=np.int64).tolist()))
+
+
+def export_cooccurrence_heatmap_bytes(
+    data_manager: "DataManager", from_csv_only: bool = True
+) -> bytes:
+    """PNG de la heatmap en mémoire (b"" si aucune pathologie)."""
+    labels, matrix = data_manager.get_cooccurrence_data(from_csv_only=from_csv_only)
+    if len(labels) == 0:
+        return b""
+    return _heatmap_png_pillow(
+        tuple(labels),
+        _matrix_key(matrix),
         "Matrice de co-occurrence des 14 pathologies thoraciques",
     )
-    plt.tight_layout()
-    plt.savefig(filepath, dpi=150, bbox_inches="tight")
-    plt.close()
+
+
+def export_cooccurrence_heatmap(
+    data_manager: "DataManager", filepath: str, from_csv_only: bool = True
+) -> bool:
+    png = export_cooccurrence_heatmap_bytes(data_manager, from_csv_only)
+    if not png:
+        return False
+    Path(filepath).write_bytes(png)
     return True
 
 
-def export_localization_report(data_manager: "DataManager", filepath: str) -> None:
-    ref_dir = Path(data_manager.reference_images_dir)
-    report_dir = Path(filepath).resolve().parent
-    pathologies = list(data_manager.PATHOLOGY_ORDER)
-    lines = [
+_REPORT_HEADER = "\n".join(
+    [
         "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Exemples de localisation</title>",
         "<style>body{font-family:sans-serif;margin:20px;} h1{color:#333;} "
         "h2{margin-top:24px;color:#555;} .grid{display:flex;flex-wrap:wrap;gap:12px;} "
@@ -157,55 +579,76 @@ def export_localization_report(data_manager: "DataManager", filepath: str) -> No
         "<h1>Exemples de localisation par pathologie</h1>",
         "<p>Images avec bounding boxes (dossier annotations_visualized).</p>",
     ]
-    for patho in pathologies:
-        sub = ref_dir / patho
-        if not sub.exists():
-            continue
-        imgs = sorted(sub.glob("*_annotated.png"))[:8]
-        if not imgs:
-            continue
-        lines.append(f"<h2>{patho}</h2><div class='grid'>")
-        for img in imgs:
-            try:
-                rel = os.path.relpath(img.resolve(), report_dir)
-            except ValueError:
-                rel = str(img)
-            lines.append(
-                f"<div class='cell'><img src='{rel}' alt='{img.name}'/><p>{img.name}</p></div>"
-            )
-        lines.append("</div>")
-    lines.append("</body></html>")
+)
+
+
+def _first_n_annotated(sub: Path, n: int = 8) -> list[str]:
+    """Les n premiers noms (ordre trié) de *_annotated.png d'un dossier."""
+    with os.scandir(sub) as it:
+        names = (e.name for e in it if e.name.endswith("_annotated.png"))
+        return heapq.nsmallest(n, names)
+
+
+def export_localization_report(
+    data_manager: "DataManager", filepath: str, include_heatmap: bool = False
+) -> None:
+    data_manager.wait_for_renders()  # Images de référence encore en rendu
+    ref_dir = Path(data_manager.reference_images_dir)
+    report_dir = Path(filepath).resolve().parent
+    pathologies = list(data_manager.PATHOLOGY_ORDER)
     out = Path(filepath)
     out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_text("\n".join(lines), encoding="utf-8")
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(_REPORT_HEADER)
+        if include_heatmap:
+            png = export_cooccurrence_heatmap_bytes(data_manager)
+            if png:
+                # Heatmap intégrée (data URI) : pas de fichier PNG à côté du rapport
+                uri = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+                f.write(
+                    "\n<h2>Co-occurrence des pathologies</h2>"
+                    f"<img src='{uri}' alt='Heatmap de co-occurrence'/>"
+                )
+        for patho in pathologies:
+            sub = ref_dir / patho
+            if not sub.is_dir():
+                continue
+            names = _first_n_annotated(sub)
+            if not names:
+                continue
+            # Chemin relatif calculé une fois par dossier de pathologie
+            try:
+                rel_dir = os.path.relpath(sub.resolve(), report_dir)
+            except ValueError:
+                rel_dir = str(sub)
+            cells = [f"<h2>{patho}</h2><div class='grid'>"]
+            for name in names:
+                rel = os.path.join(rel_dir, name)
+                cells.append(
+                    f"<div class='cell'><img src='{rel}' alt='{name}'/><p>{name}</p></div>"
+                )
+            cells.append("</div>")
+            f.write("\n" + "\n".join(cells))
+        f.write("\n</body></html>")
 
 
 def export_cooccurrence_from_csv_file(csv_path: str, output_dir: str) -> tuple:
-    labels, matrix = _cooccurrence_from_csv(csv_path)
+    labels, matrix = _cached_cooccurrence_from_csv(csv_path)
     out_dir = Path(output_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     csv_out = out_dir / "cooccurrence_pathologies.csv"
-    with open(csv_out, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([""] + labels)
-        for i, row in enumerate(matrix):
-            w.writerow([labels[i]] + row)
+    _write_matrix_csv(csv_out, labels, matrix)
     png_out = out_dir / "cooccurrence_heatmap.png"
-    try:
-        import matplotlib
-
-        matplotlib.use("Agg")
-        import matplotlib.pyplot as plt
-
-        if len(labels) > 0:
-            fig, ax = plt.subplots(figsize=(10, 8))
-            _draw_heatmap(
-                ax, labels, matrix, "Matrice de co-occurrence (à partir du CSV)"
-            )
-            plt.tight_layout()
-            plt.savefig(png_out, dpi=150, bbox_inches="tight")
-            plt.close()
-            return (str(csv_out), str(png_out))
-    except ImportError:
-        pass
+    if len(labels) > 0:
+        key = (
+            tuple(labels),
+            _matrix_key(matrix),
+            "Matrice de co-occurrence (à partir du CSV)",
+        )
+        try:
+            png = _heatmap_png(*key)
+        except ImportError:
+            png = _heatmap_png_pillow(*key)
+        png_out.write_bytes(png)
+        return (str(csv_out), str(png_out))
     return (str(csv_out), None)
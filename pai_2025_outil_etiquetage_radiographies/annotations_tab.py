@@ -2,20 +2,36 @@
 Onglet d'annotation des radiographies (canvas, liste, références, undo/redo).
 """
 
+import os
+import pickle
+from collections import deque
 from collections.abc import Callable
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
-from PIL import Image
-from PySide6.QtCore import QPoint, Qt
+import numpy as np
+from PySide6.QtCore import (
+    QObject,
+    QPoint,
+    QRect,
+    QRunnable,
+    QSize,
+    Qt,
+    QThreadPool,
+    QTimer,
+    Signal,
+)
 from PySide6.QtGui import (
     QColor,
     QImage,
+    QImageReader,
     QMouseEvent,
     QPainter,
     QPen,
     QPixmap,
+    QPixmapCache,
     QWheelEvent,
 )
 from PySide6.QtWidgets import (
@@ -34,6 +50,11 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+try:
+    from PySide6.QtOpenGLWidgets import QOpenGLWidget
+except ImportError:
+    QOpenGLWidget = None
+
 if TYPE_CHECKING:
     from pai_2025_outil_etiquetage_radiographies.data_manager import DataManager
 
@@ -54,17 +75,194 @@ PATHOLOGY_COLORS = {
     "Hernia": QColor(255, 128, 128),
     "No Finding": QColor(128, 128, 128),
 }
+PATHOLOGIES: tuple[str, ...] = tuple(PATHOLOGY_COLORS.keys())
+
+
+_DEFAULT_COLOR = QColor(255, 0, 0)
 
 
 def _annotation_color(ann: dict) -> QColor:
     c = ann.get("color")
+    if isinstance(c, QColor):
+        return c
     if c is None:
-        return PATHOLOGY_COLORS.get(ann.get("pathology", ""), QColor(255, 0, 0))
+        return PATHOLOGY_COLORS.get(ann.get("pathology", ""), _DEFAULT_COLOR)
     if hasattr(c, "red"):
         return c
     if isinstance(c, dict):
         return QColor(c.get("r", 255), c.get("g", 0), c.get("b", 0), c.get("a", 255))
-    return QColor(255, 0, 0)
+    return _DEFAULT_COLOR
+
+
+@dataclass
+class BoxStore:
+    """Boîtes d'annotation en tableaux parallèles (dicts convertis une fois)."""
+
+    xs: np.ndarray = field(default_factory=lambda: np.empty(0, np.float32))
+    ys: np.ndarray = field(default_factory=lambda: np.empty(0, np.float32))
+    ws: np.ndarray = field(default_factory=lambda: np.empty(0, np.float32))
+    hs: np.ndarray = field(default_factory=lambda: np.empty(0, np.float32))
+    colors: np.ndarray = field(default_factory=lambda: np.empty(0, np.uint32))
+    pens: list[QPen] = field(default_factory=list)
+
+    @classmethod
+    def from_annotations(
+        cls,
+        annotations: list,
+        default_color: QColor | None = None,
+        nonempty: bool = False,
+    ) -> "BoxStore":
+        """Boîtes de annotations ; sans default_color, couleur de _annotation_color."""
+        rows, rgba = [], []
+        for ann in annotations:
+            if ann.get("type") != "box":
+                continue
+            row = (
+                ann.get("x", 0),
+                ann.get("y", 0),
+                ann.get("width", 0),
+                ann.get("height", 0),
+            )
+            if nonempty and (row[2] <= 0 or row[3] <= 0):
+                continue
+            c = ann.get("color", default_color) if default_color is not None else None
+            color = c if isinstance(c, QColor) else _annotation_color(ann)
+            rows.append(row)
+            rgba.append(color.rgba())
+        arr = np.array(rows, dtype=np.float32).reshape(-1, 4)
+        colors = np.array(rgba, dtype=np.uint32)
+        # Un QPen par couleur distincte, partagé par les boîtes de même couleur
+        by_color = {c: QPen(QColor.fromRgba(c), 2) for c in dict.fromkeys(rgba)}
+        return cls(*arr.T, colors, [by_color[c] for c in rgba])
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def appended_one(self, old: "BoxStore") -> bool:
+        """Vrai si self = old plus une boîte ajoutée à la fin."""
+        n = len(old)
+        return len(self) == n + 1 and all(
+            np.array_equal(a[:n], b)
+            for a, b in (
+                (self.xs, old.xs),
+                (self.ys, old.ys),
+                (self.ws, old.ws),
+                (self.hs, old.hs),
+                (self.colors, old.colors),
+            )
+        )
+
+    def screen_rects(self, x0: float, y0: float, kx: float, ky: float) -> list:
+        """Rectangles écran (x, y, w, h) entiers : x0 + kx * x, y0 + ky * y."""
+        rects = np.stack(
+            [x0 + self.xs * kx, y0 + self.ys * ky, self.ws * kx, self.hs * ky], axis=1
+        )
+        return rects.astype(int).tolist()
+
+
+# Taille du QPixmapCache (Ko) : navigation Précédent/Suivant sans re-décodage
+PIXMAP_CACHE_LIMIT_KB = 256 * 1024
+
+
+def _read_image(image_path: str) -> QImage:
+    """Décode l'image avec Qt, en Grayscale8 (1 octet/pixel) si elle est grise."""
+    reader = QImageReader(image_path)
+    qimg = reader.read()
+    if qimg.isNull():
+        raise OSError(reader.errorString())
+    # Radiographies enregistrées en RGB : canal unique suffisant
+    if qimg.format() != QImage.Format.Format_Grayscale8 and qimg.allGray():
+        qimg = qimg.convertToFormat(QImage.Format.Format_Grayscale8)
+    return qimg
+
+
+def _pixmap_key(image_path: str) -> str:
+    """Clé QPixmapCache de l'image décodée, partagée par le canvas et les références."""
+    # La date de modification fait partie de la clé : les images de référence
+    # sont régénérées à chaque sauvegarde.
+    return f"{image_path}:{os.stat(image_path).st_mtime_ns}"
+
+
+def _load_pixmap(image_path: str) -> QPixmap:
+    """Décode l'image directement en QPixmap (sans passer par PIL), avec cache."""
+    key = _pixmap_key(image_path)
+    pm = QPixmapCache.find(key)
+    if pm is not None and not pm.isNull():
+        return pm
+    pm = QPixmap.fromImage(_read_image(image_path))
+    QPixmapCache.insert(key, pm)
+    return pm
+
+
+def _scaled_key(image_path: str, size: QSize) -> str:
+    """Clé QPixmapCache d'une image réduite à size."""
+    return f"{_pixmap_key(image_path)}:{size.width()}x{size.height()}"
+
+
+class _ScaleTask(QRunnable):
+    """Décodage + réduction d'une image hors du thread GUI (QImage uniquement)."""
+
+    def __init__(
+        self, loader: "_ScaledImageLoader", key: str, image_path: str, size: QSize
+    ) -> None:
+        super().__init__()
+        self._loader = loader
+        self._key = key
+        self._image_path = image_path
+        self._size = size
+
+    def run(self) -> None:
+        try:
+            img = _read_image(self._image_path).scaled(
+                self._size,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+        except Exception as e:
+            print(f"Erreur chargement ref {self._image_path}: {e}")
+            img = QImage()
+        try:
+            self._loader.loaded.emit(self._key, img)
+        except RuntimeError:
+            pass  # Application fermée pendant le chargement
+
+
+class _ScaledImageLoader(QObject):
+    """Réductions d'images calculées dans le QThreadPool, rangées dans QPixmapCache."""
+
+    loaded = Signal(str, QImage)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._pending: set[str] = set()
+        # Connecté en premier : le cache est rempli avant les autres slots
+        self.loaded.connect(self._store)
+
+    def request(
+        self, key: str, image_path: str, size: QSize, priority: int = 0
+    ) -> None:
+        pm = QPixmapCache.find(key)
+        if key in self._pending or (pm is not None and not pm.isNull()):
+            return
+        self._pending.add(key)
+        QThreadPool.globalInstance().start(
+            _ScaleTask(self, key, image_path, size), priority
+        )
+
+    def _store(self, key: str, img: QImage) -> None:
+        self._pending.discard(key)
+        if not img.isNull():
+            QPixmapCache.insert(key, QPixmap.fromImage(img))
+
+
+_loader: _ScaledImageLoader | None = None
+
+
+def _scaled_image_loader() -> _ScaledImageLoader:
+    global _loader
+    if _loader is None:
+        _loader = _ScaledImageLoader()
+    return _loader
 
 
 class ReferenceImageCell(QWidget):
@@ -74,7 +272,12 @@ class ReferenceImageCell(QWidget):
         super().__init__()
         self.image_path = str(image_path) if image_path else ""
         self.annotations = annotations or []
-        self.pixmap: QPixmap | None = None
+        self._store = BoxStore.from_annotations(self.annotations, nonempty=True)
+        # Seule la version à la taille de la cellule est gardée en pixmap ;
+        # la source (niveaux de gris) n'est décodée que pour la produire.
+        self._source_size: QSize | None = None
+        self._scaled: QPixmap | None = None
+        self._pending_key: str | None = None
         self.setMinimumSize(120, 120)
         self.setMaximumSize(280, 280)
         self.setFixedSize(200, 200)
@@ -83,56 +286,89 @@ class ReferenceImageCell(QWidget):
     def set_reference(self, image_path: str, annotations: list) -> None:
         self.image_path = str(image_path)
         self.annotations = annotations or []
+        self._store = BoxStore.from_annotations(self.annotations, nonempty=True)
         self._load_image()
         self.update()
 
     def _load_image(self) -> None:
-        try:
-            p = Path(self.image_path)
-            if not p.exists():
-                self.pixmap = None
-                return
-            img = Image.open(self.image_path).convert("RGB")
-            w, h = img.size
-            bpl = w * 3
-            qimg = QImage(img.tobytes(), w, h, bpl, QImage.Format.Format_RGB888)
-            self.pixmap = QPixmap.fromImage(qimg.copy())
-        except Exception as e:
-            print(f"Erreur chargement ref {self.image_path}: {e}")
-            self.pixmap = None
+        self._scaled = None
+        self._source_size = None
+        self._pending_key = None
+        if not self.image_path or not Path(self.image_path).exists():
+            return
+        reader = QImageReader(self.image_path)
+        size = reader.size()
+        if not size.isValid():
+            print(f"Erreur chargement ref {self.image_path}: {reader.errorString()}")
+            return
+        self._source_size = size
+
+    def _scaled_pixmap(self) -> QPixmap | None:
+        """Référence à la taille de la cellule (QPixmapCache, sinon chargée en tâche de fond)."""
+        if self._scaled is None and self._source_size is not None:
+            try:
+                key = _scaled_key(self.image_path, self.size())
+                pm = QPixmapCache.find(key)
+                if pm is None or pm.isNull():
+                    # Image déjà décodée par le canvas : réduite sans re-décodage
+                    source = QPixmapCache.find(_pixmap_key(self.image_path))
+                    if source is None or source.isNull():
+                        self._pending_key = key
+                        loader = _scaled_image_loader()
+                        loader.loaded.connect(
+                            self._on_loaded, Qt.ConnectionType.UniqueConnection
+                        )
+                        loader.request(key, self.image_path, self.size(), priority=1)
+                        return None
+                    pm = source.scaled(
+                        self.size(),
+                        Qt.AspectRatioMode.KeepAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation,
+                    )
+                    QPixmapCache.insert(key, pm)
+                self._scaled = pm
+            except Exception as e:
+                print(f"Erreur chargement ref {self.image_path}: {e}")
+                self._source_size = None
+        return self._scaled
+
+    def _on_loaded(self, key: str, img: QImage) -> None:
+        if key != self._pending_key:
+            return
+        self._pending_key = None
+        if img.isNull():
+            self._source_size = None
+        else:
+            pm = QPixmapCache.find(key)
+            self._scaled = pm if pm is not None else QPixmap.fromImage(img)
+        self.update()
+
+    def resizeEvent(self, event: Any) -> None:
+        self._scaled = None
+        super().resizeEvent(event)
 
     def paintEvent(self, event: Any) -> None:
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         r = self.rect()
-        if not self.pixmap or self.pixmap.isNull():
+        scaled = self._scaled_pixmap()
+        if scaled is None or scaled.isNull():
             painter.fillRect(r, Qt.GlobalColor.darkGray)
             painter.setPen(Qt.GlobalColor.gray)
             painter.drawText(r, Qt.AlignmentFlag.AlignCenter, "Réf.")
             return
-        pw, ph = self.pixmap.width(), self.pixmap.height()
+        pw, ph = self._source_size.width(), self._source_size.height()
         if pw <= 0 or ph <= 0:
             return
-        scale = min(r.width() / pw, r.height() / ph)
-        w, h = int(pw * scale), int(ph * scale)
+        # Mise à l'échelle faite une fois (chargement / redimensionnement),
+        # pas à chaque repaint ; boîtes alignées sur les axes : pas d'antialiasing.
+        w, h = scaled.width(), scaled.height()
         x0, y0 = (r.width() - w) // 2, (r.height() - h) // 2
-        painter.drawPixmap(x0, y0, w, h, self.pixmap)
-        for ann in self.annotations:
-            if ann.get("type") != "box":
-                continue
-            x = ann.get("x", 0)
-            y = ann.get("y", 0)
-            wb = ann.get("width", 0)
-            hb = ann.get("height", 0)
-            if wb <= 0 or hb <= 0:
-                continue
-            sx = x0 + (x / pw) * w
-            sy = y0 + (y / ph) * h
-            sw, sh = (wb / pw) * w, (hb / ph) * h
-            pen = QPen(_annotation_color(ann), 2)
+        painter.drawPixmap(x0, y0, scaled)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        rects = self._store.screen_rects(x0, y0, w / pw, h / ph)
+        for pen, rect in zip(self._store.pens, rects, strict=True):
             painter.setPen(pen)
-            painter.setBrush(Qt.BrushStyle.NoBrush)
-            painter.drawRect(int(sx), int(sy), int(sw), int(sh))
+            painter.drawRect(*rect)
 
 
 class ReferenceImagesPanel(QWidget):
@@ -211,36 +447,60 @@ class ReferenceImagesPanel(QWidget):
                 self.layout().removeWidget(self.placeholder)
             self.cell.show()
             self._show_current()
+            # Les autres références sont préparées en tâche de fond, dans l'ordre
+            loader = _scaled_image_loader()
+            for i, (path, _) in enumerate(refs[1:], start=1):
+                try:
+                    key = _scaled_key(path, self.cell.size())
+                except OSError:
+                    continue
+                loader.request(key, path, self.cell.size(), priority=-i)
         self.update()
 
 
-class AnnotationCanvas(QWidget):
+# Canvas rendu par OpenGL (pixmap gardée en texture, zoom/pan sur le GPU) si
+# PAI_OPENGL_CANVAS=1 ; par défaut rendu QPainter logiciel (pas de contexte
+# OpenGL requis, ex. bureau distant).
+_CanvasBase = (
+    QOpenGLWidget
+    if QOpenGLWidget is not None and os.environ.get("PAI_OPENGL_CANVAS") == "1"
+    else QWidget
+)
+
+
+class AnnotationCanvas(_CanvasBase):
     """Canvas pour dessiner des bounding boxes sur l'image."""
 
     def __init__(self) -> None:
         super().__init__()
-        self.image: Image.Image | None = None
         self.image_pixmap: QPixmap | None = None
+        self._image_size: QSize | None = None
         self.annotations: list = []
+        # Boîtes en tableaux (SoA), recalculées par set_annotations
+        self._store = BoxStore()
         self.current_annotation: dict | None = None
         self.drawing_mode: str | None = None
         self.start_point: QPoint | None = None
         self.current_pathology = "Atelectasis"
         self.current_color = QColor(255, 0, 0)
+        self._rubber_band_pen = QPen(self.current_color, 2, Qt.PenStyle.DashLine)
         self.zoom_factor = 1.0
         self.pan_offset = QPoint(0, 0)
         self.last_pan_point: QPoint | None = None
         self.annotation_created: Callable[[dict], None] | None = None
         self.setMinimumSize(800, 600)
         self.setMouseTracking(True)
+        # Repaints des mouvements souris regroupés (~60 Hz) sur la zone modifiée
+        self._pending_rect: QRect | None = None
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(16)
+        self._update_timer.timeout.connect(self._flush_update)
 
     def load_image(self, image_path: str) -> None:
         try:
-            self.image = Image.open(image_path).convert("RGB")
-            w, h = self.image.size
-            bpl = w * 3
-            qimg = QImage(self.image.tobytes(), w, h, bpl, QImage.Format.Format_RGB888)
-            self.image_pixmap = QPixmap.fromImage(qimg.copy())
+            self.image_pixmap = _load_pixmap(image_path)
+            self._image_size = self.image_pixmap.size()
             self.zoom_factor = 1.0
             self.pan_offset = QPoint(0, 0)
             self.update()
@@ -249,7 +509,15 @@ class AnnotationCanvas(QWidget):
 
     def set_annotations(self, annotations: list) -> None:
         self.annotations = annotations
-        self.update()
+        old, self._store = (
+            self._store,
+            BoxStore.from_annotations(annotations, self.current_color),
+        )
+        if self._store.appended_one(old) and annotations[-1].get("type") == "box":
+            # Boîte ajoutée à la fin (dessin) : seule sa zone est redessinée
+            self.update(self._box_screen_rect(annotations[-1]))
+        else:
+            self.update()
 
     def set_drawing_mode(self, mode: str) -> None:
         self.drawing_mode = mode
@@ -259,6 +527,7 @@ class AnnotationCanvas(QWidget):
 
     def set_color(self, color: QColor) -> None:
         self.current_color = color
+        self._rubber_band_pen = QPen(color, 2, Qt.PenStyle.DashLine)
 
     def mousePressEvent(self, event: QMouseEvent) -> None:
         if event.button() == Qt.MouseButton.LeftButton:
@@ -275,7 +544,9 @@ class AnnotationCanvas(QWidget):
                         "pathology": self.current_pathology,
                         "color": self.current_color,
                     }
-                    self.update()
+                    self._schedule_update(
+                        self._box_screen_rect(self.current_annotation)
+                    )
                 else:
                     x = min(self.start_point.x(), img_point.x())
                     y = min(self.start_point.y(), img_point.y())
@@ -293,9 +564,10 @@ class AnnotationCanvas(QWidget):
                         }
                         if callable(self.annotation_created):
                             self.annotation_created(annotation)
+                    if self.current_annotation is not None:
+                        self.update(self._box_screen_rect(self.current_annotation))
                     self.current_annotation = None
                     self.start_point = None
-                    self.update()
         elif event.button() in (Qt.MouseButton.MiddleButton,) or (
             event.button() == Qt.MouseButton.LeftButton
             and event.modifiers() & Qt.KeyboardModifier.ShiftModifier
@@ -309,16 +581,55 @@ class AnnotationCanvas(QWidget):
             y = min(self.start_point.y(), end_point.y())
             width = abs(end_point.x() - self.start_point.x())
             height = abs(end_point.y() - self.start_point.y())
+            previous = self._box_screen_rect(self.current_annotation)
             self.current_annotation["x"] = x
             self.current_annotation["y"] = y
             self.current_annotation["width"] = width
             self.current_annotation["height"] = height
-            self.update()
+            self._schedule_update(
+                previous.united(self._box_screen_rect(self.current_annotation))
+            )
         elif self.last_pan_point:
             delta = event.position().toPoint() - self.last_pan_point
             self.pan_offset += delta
             self.last_pan_point = event.position().toPoint()
-            self.update()
+            # Déplace les pixels déjà peints : seules les bandes découvertes sont
+            # redessinées
+            self.scroll(delta.x(), delta.y())
+
+    def _schedule_update(self, rect: QRect | None = None) -> None:
+        """Demande un repaint différé de rect (tout le canvas si None)."""
+        rect = self.rect() if rect is None else rect
+        if self._pending_rect is None:
+            self._pending_rect = rect
+        else:
+            self._pending_rect = self._pending_rect.united(rect)
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+
+    def _flush_update(self) -> None:
+        if self._pending_rect is not None:
+            self.update(self._pending_rect)
+            self._pending_rect = None
+
+    def _box_screen_rect(self, ann: dict) -> QRect:
+        """Rectangle écran (marge du stylo incluse) d'une boîte en coordonnées image."""
+        if not self.image_pixmap or not self._image_size:
+            return self.rect()
+        cx, cy, k = self._view_transform()
+        return QRect(
+            int(cx + ann["x"] * k),
+            int(cy + ann["y"] * k),
+            int(ann["width"] * k),
+            int(ann["height"] * k),
+        ).adjusted(-3, -3, 3, 3)
+
+    def _view_transform(self) -> tuple[float, float, float]:
+        """(cx, cy, k) : écran = (cx, cy) + k * image (pixmap à la taille de l'image)."""
+        k = self.zoom_factor
+        cx = (self.width() - self._image_size.width() * k) / 2 + self.pan_offset.x()
+        cy = (self.height() - self._image_size.height() * k) / 2 + self.pan_offset.y()
+        return cx, cy, k
 
     def mouseReleaseEvent(self, event: QMouseEvent) -> None:
         self.last_pan_point = None
@@ -332,56 +643,49 @@ class AnnotationCanvas(QWidget):
             super().wheelEvent(event)
 
     def _screen_to_image(self, screen_point: QPoint) -> QPoint:
-        if not self.image_pixmap or not self.image:
+        if not self.image_pixmap or not self._image_size:
             return QPoint(0, 0)
-        dw = self.image_pixmap.width() * self.zoom_factor
-        dh = self.image_pixmap.height() * self.zoom_factor
-        ox = (self.width() - dw) / 2 + self.pan_offset.x()
-        oy = (self.height() - dh) / 2 + self.pan_offset.y()
-        rel_x = screen_point.x() - ox
-        rel_y = screen_point.y() - oy
-        if dw > 0 and dh > 0:
-            img_x = (rel_x / dw) * self.image.size[0]
-            img_y = (rel_y / dh) * self.image.size[1]
-        else:
-            img_x = img_y = 0
-        img_x = max(0, min(self.image.size[0] - 1, img_x))
-        img_y = max(0, min(self.image.size[1] - 1, img_y))
+        iw, ih = self._image_size.width(), self._image_size.height()
+        cx, cy, k = self._view_transform()
+        img_x = min(max((screen_point.x() - cx) / k, 0), iw - 1)
+        img_y = min(max((screen_point.y() - cy) / k, 0), ih - 1)
         return QPoint(int(img_x), int(img_y))
 
     def paintEvent(self, event: Any) -> None:
+        if _CanvasBase is QWidget:
+            self._paint()
+        else:
+            super().paintEvent(event)
+
+    def paintGL(self) -> None:
+        self._paint()
+
+    def _paint(self) -> None:
+        # Boîtes alignées sur les axes : pas d'antialiasing
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        if not self.image_pixmap or not self.image:
+        if not self.image_pixmap or not self._image_size:
             painter.fillRect(self.rect(), Qt.GlobalColor.lightGray)
             return
-        iw, ih = self.image.size[0], self.image.size[1]
-        dw = self.image_pixmap.width() * self.zoom_factor
-        dh = self.image_pixmap.height() * self.zoom_factor
-        cx = (self.width() - dw) / 2 + self.pan_offset.x()
-        cy = (self.height() - dh) / 2 + self.pan_offset.y()
+        if _CanvasBase is not QWidget:
+            painter.fillRect(self.rect(), self.palette().window())
+        cx, cy, k = self._view_transform()
+        dw = self._image_size.width() * k
+        dh = self._image_size.height() * k
         painter.drawPixmap(int(cx), int(cy), int(dw), int(dh), self.image_pixmap)
-        for ann in self.annotations:
-            if ann.get("type") != "box":
-                continue
-            color = ann.get("color", self.current_color)
-            if hasattr(color, "red"):
-                pen = QPen(color, 2)
-            else:
-                pen = QPen(_annotation_color(ann), 2)
-            painter.setPen(pen)
-            x = cx + (ann["x"] / iw) * dw
-            y = cy + (ann["y"] / ih) * dh
-            w = (ann["width"] / iw) * dw
-            h = (ann["height"] / ih) * dh
-            painter.drawRect(int(x), int(y), int(w), int(h))
+        # Transformation image -> écran de toutes les boîtes en une opération
+        rects = self._store.screen_rects(cx, cy, k, k)
+        last_pen = None
+        for pen, rect in zip(self._store.pens, rects, strict=True):
+            if pen is not last_pen:
+                painter.setPen(pen)
+                last_pen = pen
+            painter.drawRect(*rect)
         if self.current_annotation and self.current_annotation.get("type") == "box":
-            pen = QPen(self.current_color, 2, Qt.PenStyle.DashLine)
-            painter.setPen(pen)
-            x = cx + (self.current_annotation["x"] / iw) * dw
-            y = cy + (self.current_annotation["y"] / ih) * dh
-            w = (self.current_annotation["width"] / iw) * dw
-            h = (self.current_annotation["height"] / ih) * dh
+            painter.setPen(self._rubber_band_pen)
+            x = cx + self.current_annotation["x"] * k
+            y = cy + self.current_annotation["y"] * k
+            w = self.current_annotation["width"] * k
+            h = self.current_annotation["height"] * k
             painter.drawRect(int(x), int(y), int(w), int(h))
 
 
@@ -394,8 +698,14 @@ class AnnotationsTab(QWidget):
         self.current_user = current_user
         self.current_image_path: str | None = None
         self.current_annotations: list = []
-        self.history: list[dict] = []
+        # Instantanés (image, annotations picklées) : 50 au plus, le plus ancien sort
+        self.history: deque[tuple[str | None, bytes]] = deque(maxlen=50)
         self.history_index = -1
+        self._list_texts: list[str] = []
+        self._ref_debounce = QTimer(self)
+        self._ref_debounce.setSingleShot(True)
+        self._ref_debounce.setInterval(150)
+        self._ref_debounce.timeout.connect(self.refresh_reference_panel)
         self.init_ui()
 
     def init_ui(self) -> None:
@@ -436,25 +746,7 @@ class AnnotationsTab(QWidget):
         self.box_button.clicked.connect(lambda: self.set_drawing_mode("box"))
         tools_layout.addWidget(self.box_button)
         self.pathology_combo = QComboBox()
-        self.pathology_combo.addItems(
-            [
-                "Atelectasis",
-                "Cardiomegaly",
-                "Effusion",
-                "Infiltration",
-                "Mass",
-                "Nodule",
-                "Pneumonia",
-                "Pneumothorax",
-                "Consolidation",
-                "Edema",
-                "Emphysema",
-                "Fibrosis",
-                "Pleural_Thickening",
-                "Hernia",
-                "No Finding",
-            ]
-        )
+        self.pathology_combo.addItems(list(PATHOLOGIES))
         self.pathology_combo.currentTextChanged.connect(self.on_pathology_changed)
         tools_layout.addWidget(QLabel("Pathologie:"))
         tools_layout.addWidget(self.pathology_combo)
@@ -519,7 +811,9 @@ class AnnotationsTab(QWidget):
 
     def on_pathology_changed(self, pathology: str) -> None:
         self.canvas.set_pathology(pathology)
-        self.refresh_reference_panel()
+        # Changements rapprochés (clavier sur la liste) : un seul rechargement
+        if self.double_view_check.isChecked():
+            self._ref_debounce.start()
 
     def choose_color(self) -> None:
         color = QColorDialog.getColor(
@@ -529,7 +823,7 @@ class AnnotationsTab(QWidget):
             self.canvas.set_color(color)
 
     def load_image(self, image_path: str) -> None:
-        self.current_image_path = image_path
+        self.current_image_path = str(image_path)
         self.canvas.load_image(image_path)
         if self.double_view_check.isChecked():
             self.refresh_reference_panel()
@@ -544,13 +838,8 @@ class AnnotationsTab(QWidget):
             self.prev_image_btn.setEnabled(False)
             self.next_image_btn.setEnabled(False)
             return
-        try:
-            idx = next(
-                i
-                for i, p in enumerate(images)
-                if str(p) == str(self.current_image_path)
-            )
-        except StopIteration:
+        idx = self.data_manager.get_image_index(self.current_image_path)
+        if idx is None:
             idx = self.data_manager.current_image_index
             if idx < 0 or idx >= n:
                 idx = 0
@@ -567,13 +856,8 @@ class AnnotationsTab(QWidget):
         if self.current_image_path is None:
             new_idx = n - 1
         else:
-            try:
-                idx = next(
-                    i
-                    for i, p in enumerate(images)
-                    if str(p) == str(self.current_image_path)
-                )
-            except StopIteration:
+            idx = self.data_manager.get_image_index(self.current_image_path)
+            if idx is None:
                 idx = self.data_manager.current_image_index
             new_idx = (idx - 1) % n
         self.data_manager.current_image_index = new_idx
@@ -587,13 +871,8 @@ class AnnotationsTab(QWidget):
         if self.current_image_path is None:
             new_idx = 0
         else:
-            try:
-                idx = next(
-                    i
-                    for i, p in enumerate(images)
-                    if str(p) == str(self.current_image_path)
-                )
-            except StopIteration:
+            idx = self.data_manager.get_image_index(self.current_image_path)
+            if idx is None:
                 idx = self.data_manager.current_image_index
             new_idx = (idx + 1) % n
         self.data_manager.current_image_index = new_idx
@@ -605,20 +884,38 @@ class AnnotationsTab(QWidget):
         self.current_annotations = self.data_manager.get_image_annotations(
             self.current_image_path
         )
+        # Couleurs stockées (dict, objet couleur) converties une fois en QColor ;
+        # sans couleur, la pathologie décide (suit une modification de pathologie)
+        for ann in self.current_annotations:
+            c = ann.get("color")
+            if c is not None and not isinstance(c, QColor):
+                ann["color"] = _annotation_color(ann)
         self.canvas.set_annotations(self.current_annotations)
         self.update_annotations_list()
 
     def update_annotations_list(self) -> None:
-        self.annotations_list.clear()
-        for idx, ann in enumerate(self.current_annotations):
+        # Lignes existantes réutilisées : seuls les textes modifiés et les lignes
+        # en plus / en moins touchent au QListWidget.
+        texts = []
+        for ann in self.current_annotations:
             text = f"{ann.get('pathology', 'Unknown')} - "
             text += f"({ann.get('x', 0):.0f}, {ann.get('y', 0):.0f}, "
             text += f"{ann.get('width', 0):.0f}x{ann.get('height', 0):.0f})"
             if ann.get("author"):
                 text += f" - {ann['author']}"
-            item = QListWidgetItem(text)
+            texts.append(text)
+        lst = self.annotations_list
+        lst.setCurrentRow(-1)
+        while lst.count() > len(texts):
+            lst.takeItem(lst.count() - 1)
+        for row in range(lst.count()):
+            if self._list_texts[row] != texts[row]:
+                lst.item(row).setText(texts[row])
+        for idx in range(lst.count(), len(texts)):
+            item = QListWidgetItem(texts[idx])
             item.setData(Qt.ItemDataRole.UserRole, idx)
-            self.annotations_list.addItem(item)
+            lst.addItem(item)
+        self._list_texts = texts
 
     def on_annotation_selected(self, item: QListWidgetItem) -> None:
         pass
@@ -633,32 +930,21 @@ class AnnotationsTab(QWidget):
         idx = current_item.data(Qt.ItemDataRole.UserRole)
         if 0 <= idx < len(self.current_annotations):
             ann = self.current_annotations[idx]
+            current = ann.get("pathology", "Atelectasis")
             pathology, ok = QInputDialog.getItem(
                 self,
                 "Modifier annotation",
                 "Pathologie:",
-                [
-                    "Atelectasis",
-                    "Cardiomegaly",
-                    "Effusion",
-                    "Infiltration",
-                    "Mass",
-                    "Nodule",
-                    "Pneumonia",
-                    "Pneumothorax",
-                    "Consolidation",
-                    "Edema",
-                    "Emphysema",
-                    "Fibrosis",
-                    "Pleural_Thickening",
-                    "Hernia",
-                    "No Finding",
-                ],
-                current=ann.get("pathology", "Atelectasis"),
+                list(PATHOLOGIES),
+                current=PATHOLOGIES.index(current) if current in PATHOLOGIES else 0,
             )
             if ok:
                 self.save_state()
                 ann["pathology"] = pathology
+                if self.current_image_path:
+                    self.data_manager.annotations[self.current_image_path] = (
+                        self.current_annotations
+                    )
                 self.refresh_annotations()
 
     def delete_annotation(self) -> None:
@@ -696,23 +982,17 @@ class AnnotationsTab(QWidget):
         QMessageBox.information(self, "Succès", "Annotations sauvegardées")
 
     def save_state(self) -> None:
-        if self.history_index < len(self.history) - 1:
-            self.history = self.history[: self.history_index + 1]
-        state = {
-            "annotations": [ann.copy() for ann in self.current_annotations],
-            "image_path": self.current_image_path,
-        }
-        self.history.append(state)
+        while len(self.history) > self.history_index + 1:
+            self.history.pop()
+        snapshot = pickle.dumps(self.current_annotations, protocol=5)
+        self.history.append((self.current_image_path, snapshot))
         self.history_index = len(self.history) - 1
-        if len(self.history) > 50:
-            self.history.pop(0)
-            self.history_index -= 1
 
     def undo(self) -> None:
         if self.history_index > 0:
             self.history_index -= 1
-            state = self.history[self.history_index]
-            self.current_annotations = [ann.copy() for ann in state["annotations"]]
+            _, snapshot = self.history[self.history_index]
+            self.current_annotations = pickle.loads(snapshot)
             if self.current_image_path:
                 self.data_manager.annotations[self.current_image_path] = (
                     self.current_annotations
@@ -722,8 +1002,8 @@ class AnnotationsTab(QWidget):
     def redo(self) -> None:
         if self.history_index < len(self.history) - 1:
             self.history_index += 1
-            state = self.history[self.history_index]
-            self.current_annotations = [ann.copy() for ann in state["annotations"]]
+            _, snapshot = self.history[self.history_index]
+            self.current_annotations = pickle.loads(snapshot)
             if self.current_image_path:
                 self.data_manager.annotations[self.current_image_path] = (
                     self.current_annotations
@@ -2,7 +2,11 @@
 Dialogue d'authentification pour l'outil d'étiquetage.
 """
 
+import hashlib
+import hmac
 import json
+import os
+import secrets
 from datetime import datetime
 from pathlib import Path
 
@@ -13,14 +17,58 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QLineEdit,
-    QMessageBox,
     QVBoxLayout,
 )
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_PBKDF2_ITERATIONS = 200_000
+
+
+def _hash_password(password: str, salt: bytes, iterations: int) -> bytes:
+    """PBKDF2-HMAC-SHA256 (implémenté en C par OpenSSL)."""
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+def _password_entry(password: str) -> dict:
+    """Champs à stocker pour un mot de passe (sel + empreinte, jamais le clair)."""
+    salt = secrets.token_bytes(16)
+    return {
+        "salt": salt.hex(),
+        "hash": _hash_password(password, salt, _PBKDF2_ITERATIONS).hex(),
+        "iterations": _PBKDF2_ITERATIONS,
+    }
+
+
+def _check_password(entry: dict, password: str) -> bool:
+    """Vérifie un mot de passe contre une entrée (empreinte ou ancien clair)."""
+    if entry.get("hash"):
+        digest = _hash_password(
+            password,
+            bytes.fromhex(entry["salt"]),
+            entry.get("iterations", _PBKDF2_ITERATIONS),
+        )
+        return hmac.compare_digest(digest.hex(), entry["hash"])
+    return hmac.compare_digest(password.encode("utf-8"), entry["password"].encode())
+
+
+def _dumps(obj: object) -> bytes:
+    """JSON compact en UTF-8 (orjson si disponible)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
 
 class AuthDialog(QDialog):
     """Dialogue d'authentification simple (utilisateurs stockés dans users.json)."""
 
+    # (chemin, mtime_ns, utilisateurs) du dernier users.json lu ou écrit
+    _users_cache: tuple[str, int, dict] | None = None
+
     def __init__(self) -> None:
         super().__init__()
         self.user: str | None = None
@@ -58,6 +106,11 @@ class AuthDialog(QDialog):
         password_layout.addWidget(self.password_input)
         layout.addLayout(password_layout)
 
+        # Erreurs affichées sur place (pas de boîte modale imbriquée)
+        self.error_label = QLabel("")
+        self.error_label.setStyleSheet("color: red")
+        layout.addWidget(self.error_label)
+
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
         )
@@ -68,20 +121,34 @@ class AuthDialog(QDialog):
         self.setLayout(layout)
 
     def load_users(self) -> None:
-        """Charge la liste des utilisateurs depuis users.json."""
-        if self.users_file.exists():
-            try:
-                with open(self.users_file, encoding="utf-8") as f:
-                    self.users = json.load(f)
-            except Exception:
-                self.users = {}
-        else:
+        """Charge la liste des utilisateurs depuis users.json (re-lu si modifié)."""
+        try:
+            mtime = self.users_file.stat().st_mtime_ns
+        except OSError:
             self.users = {}
+            return
+        cache = AuthDialog._users_cache
+        if cache is not None and cache[:2] == (str(self.users_file), mtime):
+            self.users = dict(cache[2])
+            return
+        try:
+            with open(self.users_file, encoding="utf-8") as f:
+                self.users = json.load(f)
+        except Exception:
+            self.users = {}
+            return
+        AuthDialog._users_cache = (str(self.users_file), mtime, dict(self.users))
 
     def save_users(self) -> None:
-        """Sauvegarde la liste des utilisateurs."""
-        with open(self.users_file, "w", encoding="utf-8") as f:
-            json.dump(self.users, f, indent=2, ensure_ascii=False)
+        """Sauvegarde la liste des utilisateurs (écriture atomique)."""
+        tmp = self.users_file.with_name(self.users_file.name + ".tmp")
+        tmp.write_bytes(_dumps(self.users))
+        os.replace(tmp, self.users_file)
+        AuthDialog._users_cache = (
+            str(self.users_file),
+            self.users_file.stat().st_mtime_ns,
+            dict(self.users),
+        )
 
     def authenticate(self) -> None:
         """Vérifie les identifiants et accepte le dialogue."""
@@ -89,23 +156,33 @@ class AuthDialog(QDialog):
         password = self.password_input.text()
 
         if not username:
-            QMessageBox.warning(self, "Erreur", "Veuillez entrer un nom d'utilisateur")
+            self.error_label.setText("Veuillez entrer un nom d'utilisateur")
             return
 
         if username in self.users:
-            if (
-                self.users[username].get("password")
-                and password != self.users[username]["password"]
-            ):
-                QMessageBox.warning(self, "Erreur", "Mot de passe incorrect")
-                return
+            entry = self.users[username]
+            if entry.get("hash") or entry.get("password"):
+                if not _check_password(entry, password):
+                    self.error_label.setText("Mot de passe incorrect")
+                    self.password_input.selectAll()
+                    self.password_input.setFocus()
+                    return
+                if not entry.get("hash"):
+                    # Ancien compte en clair : converti à la première connexion
+                    entry = {k: v for k, v in entry.items() if k != "password"}
+                    entry.update(_password_entry(password))
+                    self.users[username] = entry
+                    self.save_users()
         else:
-            self.users[username] = {
-                "password": password if password else None,
-                "created": datetime.now().isoformat(),
-            }
+            entry = {"created": datetime.now().isoformat()}
+            if password:
+                entry.update(_password_entry(password))
+            else:
+                entry["password"] = None
+            self.users[username] = entry
             self.save_users()
 
+        self.error_label.clear()
         self.user = username
         self.accept()
 
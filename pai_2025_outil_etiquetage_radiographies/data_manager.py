@@ -3,272 +3,1154 @@ Gestionnaire de données pour l'outil d'étiquetage de radiographies.
 """
 
 import csv
+import hashlib
+import io
 import json
-from datetime import datetime, timedelta
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+from collections import Counter
+from collections.abc import Iterator, MutableMapping
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
 from PySide6.QtGui import QColor
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _json_dumps(obj: object, indent: bool = False) -> bytes:
+    """JSON en UTF-8 (orjson si disponible), indenté de 2 si indent."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    text = json.dumps(obj, indent=2 if indent else None, ensure_ascii=False)
+    return text.encode("utf-8")
+
+
+# Colonnes Data_Entry lues ; les autres sont ignorées à la lecture
+_METADATA_COLUMNS = frozenset(
+    (
+        "Image Index",
+        "filename",
+        "Patient ID",
+        "Patient Age",
+        "Patient Gender",
+        "View Position",
+        "Follow-up #",
+        "Finding Labels",
+        "Finding Label",
+    )
+)
+
+# Origine des dates Data_Entry : 2000-01-01 + Follow-up # jours
+_BASE_DATE = datetime(2000, 1, 1)
+
+# Base unique des annotations (remplace un JSON par image)
+_ANNOTATIONS_DB = "annotations.db"
+# Clés d'annotation stockées en colonnes ; color et le reste à part
+_ANNOTATION_FIELDS = (
+    "type",
+    "x",
+    "y",
+    "width",
+    "height",
+    "pathology",
+    "author",
+    "date",
+    "confidence",
+)
+# Valeurs répétées d'une annotation à l'autre (quelques dizaines distinctes)
+_INTERNED_FIELDS = ("type", "pathology", "author")
+# x/y/w/h/confidence sans type déclaré : int et float conservés tels quels
+_ANNOTATIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    image TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    image_path TEXT,
+    type TEXT,
+    x, y, w, h,
+    pathology TEXT,
+    author TEXT,
+    date TEXT,
+    confidence,
+    color_rgba INTEGER,
+    extra TEXT,
+    PRIMARY KEY (image, idx)
+) WITHOUT ROWID;
+-- Empreinte du dernier rendu des images de référence, par image
+CREATE TABLE IF NOT EXISTS renders (
+    image TEXT PRIMARY KEY,
+    hash BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Au-delà de ce nombre d'anciens JSON, décodage dans un pool de processus
+_PROCESS_PARSE_MIN = 2000
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    """Démarrage des pools de processus sans fork.
+
+    Les pools sont lancés depuis un thread de travail alors que les threads Qt
+    et la connexion SQLite du parent sont actifs : un fork pourrait bloquer les
+    enfants. Les tâches ne dépendent que de leurs arguments.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+# Un seul motif pour le parcours : groupe 1 = image, groupe 2 = CSV
+_DATASET_FILE_RE = re.compile(r".*\.(?:(png|jpe?g)|(csv))$", re.IGNORECASE)
+
+
+def _read_json_file(path: Path) -> tuple[object, Exception | None]:
+    """Lit et décode un JSON ; (données, None) ou (None, erreur)."""
+    try:
+        return _json_loads(path.read_bytes()), None
+    except Exception as e:
+        return None, e
+
+
+def _intern_fields(ann: dict) -> dict:
+    """type / pathology / author internés : une chaîne par valeur distincte."""
+    for k in _INTERNED_FIELDS:
+        v = ann.get(k)
+        if type(v) is str:
+            ann[k] = sys.intern(v)
+    return ann
+
+
+@lru_cache(maxsize=256)
+def _qcolor(r: int, g: int, b: int, a: int) -> QColor:
+    """QColor partagée par couleur (quelques couleurs de palette, jamais modifiées)."""
+    return QColor(r, g, b, a)
+
+
+@lru_cache(maxsize=256)
+def _qcolor_rgba(rgba: int) -> QColor:
+    """QColor partagée pour une valeur ARGB de la base."""
+    return QColor.fromRgba(rgba)
+
+
+def _restore_loaded(annotations: list[dict]) -> None:
+    """Annotations JSON relues : QColor recréées, chaînes internées (en place)."""
+    for ann in annotations:
+        _intern_fields(ann)
+        if "color" in ann and isinstance(ann["color"], dict):
+            c = ann["color"]
+            ann["color"] = _qcolor(
+                c.get("r", 255), c.get("g", 0), c.get("b", 0), c.get("a", 255)
+            )
+
+
+def _annotation_row(image: str, idx: int, image_path: str, ann: dict) -> tuple:
+    """Ligne de la table annotations pour une annotation."""
+    extra = {k: v for k, v in ann.items() if k not in _ANNOTATION_FIELDS}
+    values = []
+    for k in _ANNOTATION_FIELDS:
+        v = ann.get(k)
+        if v is None and k in ann:
+            extra[k] = None  # None explicite, distinct d'une clé absente
+        values.append(v)
+    color = extra.pop("color", None)
+    if isinstance(color, dict):
+        color = _qcolor(
+            color.get("r", 255),
+            color.get("g", 0),
+            color.get("b", 0),
+            color.get("a", 255),
+        )
+    if hasattr(color, "rgba"):
+        rgba = color.rgba()
+    else:
+        rgba = None
+        if color is not None or "color" in ann:
+            extra["color"] = color
+    return (
+        image,
+        idx,
+        image_path,
+        *values,
+        rgba,
+        _json_dumps(extra).decode("utf-8") if extra else None,
+    )
+
+
+def _annotation_from_row(values: tuple) -> dict:
+    """Annotation reconstruite depuis (champs..., color_rgba, extra)."""
+    *fields, rgba, extra = values
+    ann = {k: v for k, v in zip(_ANNOTATION_FIELDS, fields) if v is not None}
+    if rgba is not None:
+        ann["color"] = _qcolor_rgba(rgba)
+    if extra:
+        ann.update(_json_loads(extra))
+    return _intern_fields(ann)
+
+
+@lru_cache(maxsize=4)
+def _reference_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """Police des étiquettes (Helvetica si présente), résolue une fois par taille."""
+    try:
+        return ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def _render_reference(
+    image_path: str,
+    annotations: list[dict],
+    colors: dict[str, tuple[int, int, int]],
+    output_paths: list[Path],
+) -> None:
+    """Dessine les boîtes sur l'image et l'enregistre (exécutable dans un processus)."""
+    img = Image.open(image_path).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    font = _reference_font(16)
+    for ann in annotations:
+        if ann.get("type") != "box":
+            continue
+        x = int(ann.get("x", 0))
+        y = int(ann.get("y", 0))
+        w = int(ann.get("width", 0))
+        h = int(ann.get("height", 0))
+        pathology = ann.get("pathology", "Unknown")
+        if pathology in colors:
+            color = colors[pathology]
+        elif isinstance(ann.get("color"), dict):
+            c = ann["color"]
+            color = (c.get("r", 255), c.get("g", 0), c.get("b", 0))
+        else:
+            color = (255, 0, 0)
+        draw.rectangle([x, y, x + w, y + h], outline=color, width=3)
+        try:
+            label = pathology
+            if ann.get("author"):
+                label += f" ({ann['author']})"
+            bbox = draw.textbbox((x, y - 20), label, font=font)
+            bbox = (bbox[0] - 2, bbox[1] - 2, bbox[2] + 2, bbox[3] + 2)
+            draw.rectangle(bbox, fill=(0, 0, 0))
+            draw.text((x, y - 20), label, fill=color, font=font)
+        except Exception:
+            pass
+    if not output_paths:
+        return
+    # Un seul encodage PNG (zlib niveau 1 : sans perte, bien plus rapide),
+    # les mêmes octets écrits dans chaque dossier de pathologie
+    buf = io.BytesIO()
+    img.save(buf, "PNG", compress_level=1)
+    data = buf.getbuffer()
+    # Un seul fichier sur disque : remplacé atomiquement (nouvel inode, les
+    # liens d'un rendu précédent gardent leur contenu), puis lié en dur
+    # dans les autres dossiers ; copie si le lien est impossible
+    first, *others = output_paths
+    tmp = first.with_name(first.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, first)
+    for output_path in others:
+        try:
+            output_path.unlink(missing_ok=True)
+            os.link(first, output_path)
+        except OSError:
+            output_path.write_bytes(data)
+
+
+def _render_hash(
+    image_path: str, annotations: list[dict], output_paths: list[Path]
+) -> bytes | None:
+    """Empreinte de ce qu'un rendu produirait (None si non calculable)."""
+    try:
+        source = os.stat(image_path).st_mtime_ns
+        payload = [source, sorted(map(str, output_paths)), annotations]
+        if orjson is not None:
+            data = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        else:
+            data = json.dumps(payload, sort_keys=True).encode("utf-8")
+    except (OSError, TypeError, ValueError):
+        return None
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+def _write_text(item: tuple[Path, str]) -> None:
+    """Écrit (chemin, contenu) en UTF-8 en un seul appel."""
+    path, content = item
+    path.write_text(content, encoding="utf-8")
+
+
+def _is_box(ann: dict) -> bool:
+    """Annotation dessinable comme boîte (type box, ou x/width présents)."""
+    return ann.get("type") == "box" or ("x" in ann and "width" in ann)
+
+
+def _path_sort_key(path: str) -> str:
+    """Clé donnant l'ordre de Path (par composant) : séparateur avant tout caractère."""
+    return path.replace(os.sep, "\0")
+
+
+def _open_seq(path: Path) -> io.BufferedReader:
+    """Ouvre path en binaire en annonçant une lecture séquentielle (readahead)."""
+    f = open(path, "rb")
+    try:
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except (AttributeError, OSError):
+        pass  # Windows / macOS : pas de posix_fadvise
+    return f
+
+
+def _read_seq(path: Path) -> bytes:
+    with _open_seq(path) as f:
+        return f.read()
+
+
+def _scan_dataset(root: str, image_root: str) -> tuple[list[str], list[str]]:
+    """Parcourt root une seule fois (os.scandir) : images sous image_root, CSV partout."""
+    images, csv_files = [], []
+    image_root_norm = os.path.normpath(image_root)
+    stack = [(image_root, True)]
+    if os.path.normpath(root) != image_root_norm:
+        stack.append((root, False))
+    while stack:
+        directory, in_images = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        # image_root est déjà dans la pile : pas de second parcours
+                        if in_images or os.path.normpath(entry.path) != image_root_norm:
+                            stack.append((entry.path, in_images))
+                        continue
+                    m = _DATASET_FILE_RE.match(entry.name)
+                    if m is None:
+                        continue
+                    if m.group(1):
+                        if in_images:
+                            images.append(entry.path)
+                    else:
+                        csv_files.append(entry.path)
+        except OSError as e:
+            print(f"Erreur lecture dossier: {e}")
+    return images, csv_files
+
+
+_MISSING = object()
+
+
+# Normalisations de colonnes pour filter_images (absent -> valeur de get(..., défaut))
+def _upper(v: object) -> str:
+    return v.upper() if isinstance(v, str) else ""
+
+
+def _strip_upper(v: object) -> str:
+    return v.strip().upper() if isinstance(v, str) else ""
+
+
+def _date(v: object) -> str:
+    return "" if v is _MISSING else (v or "")
+
+
+def _age(v: object) -> float:
+    try:
+        return float(int(str("0" if v is _MISSING else v).replace("Y", "")))
+    except ValueError:
+        return float("nan")
+
+
+class MetadataTable(MutableMapping):
+    """Métadonnées par image stockées en colonnes (une liste par champ).
+
+    Se lit comme un dict chemin -> dict ; les dicts sont construits à la demande.
+    """
+
+    FIELDS = ("patient_id", "age", "sex", "view", "date", "pathologies", "filename")
+
+    def __init__(self) -> None:
+        self._row: dict[str, int] = {}
+        self._columns: dict[str, list] = {f: [] for f in self.FIELDS}
+        # Clés hors FIELDS, rares (métadonnées importées à la main)
+        self._extra: dict[int, dict] = {}
+        self._cache: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._row)
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._row
+
+    def __getitem__(self, path: str) -> dict:
+        i = self._row[path]
+        meta = {}
+        for f, col in self._columns.items():
+            v = col[i]
+            if v is not _MISSING:
+                meta[f] = list(v) if f == "pathologies" else v
+        if i in self._extra:
+            meta.update(self._extra[i])
+        return meta
+
+    def __setitem__(self, path: str, meta: dict) -> None:
+        self._set_row(path, [meta.get(f, _MISSING) for f in self.FIELDS])
+        extra = {k: v for k, v in meta.items() if k not in self._columns}
+        if extra:
+            self._extra[self._row[path]] = extra
+        else:
+            self._extra.pop(self._row[path], None)
+
+    def __delitem__(self, path: str) -> None:
+        # La ligne reste dans les colonnes (inaccessible) : pas de réindexation
+        i = self._row.pop(path)
+        self._extra.pop(i, None)
+        self._cache.clear()
+
+    def _set_row(self, path: str, values: list) -> None:
+        i = self._row.get(path)
+        if i is None:
+            self._row[path] = len(self._columns["filename"])
+            for col, v in zip(self._columns.values(), values):
+                col.append(v)
+        else:
+            for col, v in zip(self._columns.values(), values):
+                col[i] = v
+        self._cache.clear()
+
+    def extend(self, paths: list[str], columns: dict[str, list]) -> None:
+        """Ajoute des lignes colonne par colonne (sans dict intermédiaire)."""
+        values = [columns.get(f) or [_MISSING] * len(paths) for f in self.FIELDS]
+        row = self._row
+        if any(p in row for p in paths):
+            for path, *vals in zip(paths, *values):
+                self._set_row(path, vals)
+            return
+        # Chemins nouveaux : colonnes prolongées et index construit en C
+        # (doublon dans paths : la dernière ligne gagne, comme une affectation)
+        start = len(self._columns["filename"])
+        for col, vals in zip(self._columns.values(), values):
+            col.extend(vals)
+        row.update(zip(paths, range(start, start + len(paths))))
+        self._cache.clear()
+
+    def pathologies(self, path: str) -> list[str]:
+        """Pathologies d'une image, sans copie ([] si inconnue)."""
+        i = self._row.get(path)
+        v = self._columns["pathologies"][i] if i is not None else _MISSING
+        return [] if v is _MISSING else v
+
+    def rows(self, paths: list[str]) -> np.ndarray:
+        """Ligne de chaque chemin (-1 si absent)."""
+        get = self._row.get
+        return np.fromiter((get(p, -1) for p in paths), np.intp, len(paths))
+
+    def column(self, field: str, transform=None) -> np.ndarray:
+        """Colonne (objets) transformée, plus une case finale pour les absents (-1)."""
+        key = (field, transform)
+        if key not in self._cache:
+            get = transform or (lambda v: v)
+            col = self._columns[field]
+            self._cache[key] = np.array(
+                [get(v) for v in col] + [get(_MISSING)], dtype=object
+            )
+        return self._cache[key]
+
+    def column_codes(self, field: str, transform=None) -> tuple[np.ndarray, np.ndarray]:
+        """(valeurs distinctes triées, rang de chaque case de column) : bornes en entiers."""
+        key = ("codes", field, transform)
+        if key not in self._cache:
+            uniques, codes = np.unique(
+                self.column(field, transform), return_inverse=True
+            )
+            self._cache[key] = (uniques, codes.reshape(-1))
+        return self._cache[key]
+
+    def has_pathology(self, label: str) -> np.ndarray:
+        """Masque des lignes contenant label, plus une case finale False."""
+        key = ("has", label)
+        if key not in self._cache:
+            col = self._columns["pathologies"]
+            # Un test par liste distincte (partagées par Finding Labels)
+            memo = {id(_MISSING): False}
+            for v in col:
+                if id(v) not in memo:
+                    memo[id(v)] = label in v
+            self._cache[key] = np.fromiter(
+                (memo[id(v)] for v in col + [_MISSING]), bool, len(col) + 1
+            )
+        return self._cache[key]
+
+    def label_masks(self, labels: tuple[str, ...]) -> np.ndarray:
+        """Masque de bits (bit i = labels[i]) des pathologies de chaque ligne.
+
+        -1 si la ligne n'a aucune pathologie ; case finale -1 pour les absents.
+        """
+        key = ("masks", labels)
+        if key not in self._cache:
+            if len(labels) > 62:
+                raise ValueError("au plus 62 pathologies par masque int64")
+            bit = {p: 1 << i for i, p in enumerate(labels)}
+            # Les listes sont partagées entre lignes de même Finding Labels :
+            # un seul calcul par liste distincte
+            memo: dict[int, int] = {}
+            masks = []
+            for v in self._columns["pathologies"]:
+                m = memo.get(id(v))
+                if m is None:
+                    if v is _MISSING or not v:
+                        m = -1
+                    else:
+                        m = 0
+                        for p in v:
+                            m |= bit.get(p, 0)
+                    memo[id(v)] = m
+                masks.append(m)
+            masks.append(-1)
+            self._cache[key] = np.array(masks, dtype=np.int64)
+        return self._cache[key]
+
+    def label_matrix(self, labels: tuple[str, ...]) -> np.ndarray:
+        """Matrice d'incidence (lignes + case finale) x labels, en float64 (BLAS)."""
+        key = ("incidence", labels)
+        if key not in self._cache:
+            masks = np.maximum(self.label_masks(labels), 0)
+            bits = (masks[:, None] >> np.arange(len(labels))) & 1
+            self._cache[key] = bits.astype(np.float64)
+        return self._cache[key]
+
+
+class AnnotationTable(dict):
+    """dict chemin -> annotations qui note, pour chaque observateur, les chemins touchés.
+
+    Un accès par [] compte comme une modification (liste modifiée en place).
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Un ensemble par observateur (statistiques, index par pathologie)
+        self._watchers: list[set[str]] = []
+
+    def watch(self) -> set[str]:
+        """Ensemble des chemins touchés (tous au départ), à vider après chaque relevé."""
+        touched = set(self)
+        self._watchers.append(touched)
+        return touched
+
+    def __reduce__(self) -> tuple:
+        """Picklé comme un dict simple : les observateurs ne sont pas transmis."""
+        return AnnotationTable, (dict(self),)
+
+    def _touch(self, paths) -> None:
+        for touched in self._watchers:
+            touched.update(paths)
+
+    def __getitem__(self, path: str) -> list:
+        self._touch((path,))
+        return super().__getitem__(path)
+
+    def __setitem__(self, path: str, annotations: list) -> None:
+        self._touch((path,))
+        super().__setitem__(path, annotations)
+
+    def __delitem__(self, path: str) -> None:
+        self._touch((path,))
+        super().__delitem__(path)
+
+    def setdefault(self, path: str, default: list | None = None) -> list:
+        self._touch((path,))
+        return super().setdefault(path, default)
+
+    def pop(self, path: str, *default: object) -> object:
+        self._touch((path,))
+        return super().pop(path, *default)
+
+    def popitem(self) -> tuple[str, list]:
+        path, annotations = super().popitem()
+        self._touch((path,))
+        return path, annotations
+
+    def update(self, *args, **kwargs) -> None:
+        other = dict(*args, **kwargs)
+        self._touch(other)
+        super().update(other)
+
+    def clear(self) -> None:
+        self._touch(self)
+        super().clear()
+
 
 class DataManager:
     """Gère les données (images, métadonnées, annotations)."""
 
     def __init__(self) -> None:
         self.dataset_path: Path | None = None
-        self.images: list[Path] = []
-        self.metadata: dict[str, dict] = {}
-        self.annotations: dict[str, list] = {}
+        self.images: list[str] = []
+        self.metadata: MetadataTable = MetadataTable()
+        self.annotations: AnnotationTable = AnnotationTable()
         self.current_image_index: int = 0
+        self._cooccurrence_cache: tuple[list[str], list[list[int]]] | None = None
+        # Index chemin -> position dans self.images, reconstruit si la liste change
+        self._image_index: dict[str, int] = {}
+        self._image_index_of: list[str] | None = None
+        # (images, len, metadata, len, lignes) pour _image_rows
+        self._image_rows_cache: tuple | None = None
+        # Taille (en-tête) des images, lue une fois par chargement (_image_size)
+        self._image_sizes: dict[str, tuple[int, int]] = {}
+        # Nom relatif (CSV) -> chemin découvert, pour résoudre sans stat()
+        self._image_name_index: dict[str, str] = {}
+        self._image_name_index_lower: dict[str, str] = {}
+        # Dossiers de sortie créés à la première écriture (_ensure_dir)
         self.annotations_dir = Path("annotations")
-        self.annotations_dir.mkdir(exist_ok=True)
         self.reference_images_dir = Path("annotations_visualized")
-        self.reference_images_dir.mkdir(exist_ok=True)
+        self._ready_dirs: set[Path] = set()
+        # (chemin, connexion) vers annotations.db, ouverte au premier usage
+        self._db: tuple[Path, sqlite3.Connection] | None = None
+        # Rendus de référence en arrière-plan (save_annotations), dans l'ordre
+        self._ref_pool: ThreadPoolExecutor | None = None
+        self._pending_renders: list[tuple[Future, str, bytes | None]] = []
+        # Statistiques tenues à jour image par image (voir get_statistics)
+        self._stats_of: AnnotationTable | None = None
+        self._stats_dirty: set[str] = set()
+        self._stats_parts: dict[str, tuple[int, Counter, Counter]] = {}
+        self._stats_totals: list = [0, 0, Counter(), Counter()]
+        # Index pathologie -> images à boîtes (voir _pathology_index)
+        self._ref_of: AnnotationTable | None = None
+        self._ref_dirty: set[str] = set()
+        self._ref_index: dict[str, set[str]] = {}
+        self._ref_labels: dict[str, set[str]] = {}
+        self._ref_pos: dict[str, int] = {}
+        self._ref_next = 0
+        # Path.resolve() mémorisé (références : comparaison de chemins)
+        self._resolved: dict[str, str] = {}
+        # (images, len, stem -> chemins) pour les exemples de référence
+        self._stem_index: tuple | None = None
 
     def load_dataset(self, dataset_path: str) -> None:
         """Charge un dataset depuis un dossier (découverte des images)."""
         self.dataset_path = Path(dataset_path)
         self.images = []
-        self.metadata = {}
-        self.annotations = {}
-
-        image_extensions = [".png", ".jpg", ".jpeg"]
-        for ext in image_extensions:
-            self.images.extend(list(self.dataset_path.glob(f"**/*{ext}")))
-            self.images.extend(list(self.dataset_path.glob(f"**/*{ext.upper()}")))
-        self.images = sorted(set(self.images))
+        self.metadata = MetadataTable()
+        self.annotations = AnnotationTable()
+        self._cooccurrence_cache = None
+        self._image_sizes = {}
+        self._resolved = {}
 
         root_for_csv = self.dataset_path
         if self.dataset_path.name.lower() == "images":
             root_for_csv = self.dataset_path.parent
 
-        csv_files = list(root_for_csv.glob("**/*.csv"))
-        if csv_files:
-            data_entry = [f for f in csv_files if "Data_Entry" in f.name]
-            if data_entry:
-                self._load_metadata_from_csv(data_entry[0], root_for_csv)
+        # Chemins gardés en str (Path construit à la demande), sans doublon
+        images, csv_paths = _scan_dataset(str(root_for_csv), str(self.dataset_path))
+        images.sort(key=_path_sort_key)
+        self.images = images
+        self._build_image_name_index()
+        csv_files = [Path(p) for p in sorted(csv_paths, key=_path_sort_key)]
+        bbox_files = [f for f in csv_files if f.name == "BBox_List_2017.csv"]
+        # Lecture du CSV BBox en tâche de fond pendant l'analyse de Data_Entry
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            bbox_future = pool.submit(_read_seq, bbox_files[0]) if bbox_files else None
+            if csv_files:
+                data_entry = [f for f in csv_files if "Data_Entry" in f.name]
+                if data_entry:
+                    self._load_metadata_from_csv(data_entry[0], root_for_csv)
+                else:
+                    self._load_metadata_from_csv(csv_files[0], root_for_csv)
             else:
-                self._load_metadata_from_csv(csv_files[0], root_for_csv)
-        else:
-            self._generate_default_metadata()
-
-        bbox_files = list(root_for_csv.glob("**/BBox_List_2017.csv"))
-        if bbox_files:
-            self._load_bbox_from_csv(bbox_files[0])
+                self._generate_default_metadata()
+            if bbox_future is not None:
+                try:
+                    data = io.BytesIO(bbox_future.result())
+                except OSError as e:
+                    print(f"Erreur lors du chargement des bounding boxes: {e}")
+                else:
+                    self._load_bbox_from_csv(data)
 
         self._load_existing_annotations()
 
+    def _ensure_dir(self, directory: Path) -> Path:
+        """Crée directory (et ses parents) une seule fois par DataManager."""
+        if directory not in self._ready_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._ready_dirs.add(directory)
+        return directory
+
+    def _annotations_db(self) -> sqlite3.Connection:
+        """Connexion à annotations.db (créée si besoin, réouverte si le dossier change)."""
+        path = self._ensure_dir(self.annotations_dir) / _ANNOTATIONS_DB
+        if self._db is None or self._db[0] != path:
+            if self._db is not None:
+                self._db[1].close()
+            # Chargement possible hors du thread GUI (main_qt) : accès sérialisés
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_ANNOTATIONS_SCHEMA)
+            self._db = (path, conn)
+        return self._db[1]
+
+    def _build_image_name_index(self) -> None:
+        """Indexe les images par nom relatif à dataset_path (puis à dataset_path/images)."""
+        prefix = os.path.join(str(self.dataset_path), "")
+        images_prefix = os.path.join(prefix, "images", "")
+        index: dict[str, str] = {}
+        for p in self.images:
+            if p.startswith(images_prefix):
+                index[p[len(images_prefix) :]] = p
+        # Même priorité que l'ancien test exists() : dataset_path/nom d'abord
+        for p in self.images:
+            if p.startswith(prefix):
+                index[p[len(prefix) :]] = p
+        self._image_name_index = index
+        self._image_name_index_lower = {k.lower(): v for k, v in index.items()}
+
+    def _resolve_image(self, image_name: str) -> str | None:
+        """Chemin d'une image nommée dans un CSV (None si absente du dataset)."""
+        path = self._image_name_index.get(image_name)
+        if path is None:
+            path = self._image_name_index_lower.get(image_name.lower())
+        return path
+
     def _load_existing_annotations(self) -> None:
         """Charge les annotations existantes depuis le dossier annotations."""
+        stored = self._read_annotations_db()
+        # Anciens fichiers JSON par image : lus seulement sans entrée en base.
+        # Un seul listage du dossier au lieu d'un exists() par image
+        try:
+            with os.scandir(self.annotations_dir) as it:
+                saved = {e.name for e in it if e.name.endswith(".json")}
+        except OSError:
+            saved = set()
+        given: dict[str, list] = {}
+        to_read = []
         for img_path in self.images:
-            annotation_file = self.annotations_dir / f"{Path(img_path).stem}.json"
-            if annotation_file.exists():
-                try:
-                    with open(annotation_file, encoding="utf-8") as f:
-                        data = json.load(f)
+            self.annotations[img_path] = []
+            stem = os.path.splitext(os.path.basename(img_path))[0]
+            anns = stored.pop(stem, None)
+            if anns is not None:
+                given[stem] = anns
+            elif stem in given:
+                # Même nom dans deux sous-dossiers : listes distinctes
+                anns = [dict(a) for a in given[stem]]
+            if anns is not None:
+                self.annotations[img_path] = anns
+            elif stem + ".json" in saved:
+                to_read.append((img_path, self.annotations_dir / f"{stem}.json"))
+        if not to_read:
+            return
+        # Lectures + décodage JSON en parallèle (beaucoup de petits fichiers) ;
+        # les QColor sont créées ici, dans le processus principal
+        cpus = os.cpu_count() or 1
+        if len(to_read) >= _PROCESS_PARSE_MIN and cpus > 1:
+            # Décodage limité par le GIL : un processus par cœur
+            pool = ProcessPoolExecutor(max_workers=cpus, mp_context=_process_context())
+            chunksize = 64
+        else:
+            workers = min(32, cpus * 4, len(to_read))
+            pool, chunksize = ThreadPoolExecutor(max_workers=workers), 1
+        with pool:
+            results = pool.map(
+                _read_json_file, (path for _, path in to_read), chunksize=chunksize
+            )
+            for (img_path, _), (data, error) in zip(to_read, results):
+                if error is None:
+                    try:
                         annotations = data.get("annotations", [])
-                        for ann in annotations:
-                            if "color" in ann and isinstance(ann["color"], dict):
-                                c = ann["color"]
-                                ann["color"] = QColor(
-                                    c.get("r", 255),
-                                    c.get("g", 0),
-                                    c.get("b", 0),
-                                    c.get("a", 255),
-                                )
-                        self.annotations[str(img_path)] = annotations
-                except Exception as e:
+                        _restore_loaded(annotations)
+                    except Exception as e:
+                        error = e
+                if error is not None:
                     print(
-                        f"Erreur lors du chargement des annotations pour {img_path}: {e}"
+                        f"Erreur lors du chargement des annotations pour {img_path}: {error}"
                     )
-                    self.annotations[str(img_path)] = []
-            else:
-                self.annotations[str(img_path)] = []
+                    continue
+                self.annotations[img_path] = annotations
+
+    def _read_annotations_db(self) -> dict[str, list[dict]]:
+        """Toutes les annotations de annotations.db en une requête, par image."""
+        stored: dict[str, list[dict]] = {}
+        db_path = self.annotations_dir / _ANNOTATIONS_DB
+        if not db_path.exists():
+            return stored
+        try:
+            rows = self._annotations_db().execute(
+                "SELECT image, type, x, y, w, h, pathology, author, date,"
+                " confidence, color_rgba, extra FROM annotations ORDER BY image, idx"
+            )
+            for image, *values in rows:
+                stored.setdefault(image, []).append(_annotation_from_row(values))
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Erreur lors de la lecture de {db_path}: {e}")
+        return stored
 
     def save_annotations(self, image_path: str) -> None:
-        """Sauvegarde les annotations d'une image en JSON."""
+        """Sauvegarde les annotations d'une image dans annotations.db."""
         if image_path not in self.annotations:
             return
-        serializable_annotations = []
-        for ann in self.annotations[image_path]:
-            ann_copy = ann.copy()
-            if "color" in ann_copy:
-                color = ann_copy["color"]
-                if hasattr(color, "red"):
-                    ann_copy["color"] = {
-                        "r": color.red(),
-                        "g": color.green(),
-                        "b": color.blue(),
-                        "a": color.alpha(),
-                    }
-            serializable_annotations.append(ann_copy)
-        annotation_file = self.annotations_dir / f"{Path(image_path).stem}.json"
-        data = {
-            "image_path": image_path,
-            "metadata": self.metadata.get(image_path, {}),
-            "annotations": serializable_annotations,
-            "last_modified": datetime.now().isoformat(),
+        self._store_annotations([image_path])
+        annotations = self.annotations[image_path]
+        if annotations:
+            self._generate_reference_image(
+                image_path, self._serialize_annotations_for_export(annotations)
+            )
+
+    def save_all_annotations(self, image_paths: list[str] | None = None) -> None:
+        """Sauvegarde plusieurs images (toutes par défaut), rendus PNG en parallèle."""
+        # Un rendu encore en cours écrirait les mêmes fichiers
+        self.wait_for_renders()
+        # Même nom de fichier = même entrée en base : la dernière image l'emporte
+        by_stem = {
+            Path(p).stem: p
+            for p in (self.annotations if image_paths is None else image_paths)
+            if p in self.annotations
         }
-        with open(annotation_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        if serializable_annotations:
-            self._generate_reference_image(image_path, serializable_annotations)
+        paths = list(by_stem.values())
+        self._store_annotations(paths)
+        jobs = []
+        for p in paths:
+            if self.annotations[p]:
+                anns = self._serialize_annotations_for_export(self.annotations[p])
+                job = self._reference_job(p, anns)
+                if job is not None:
+                    jobs.append((p, anns, *job))
+        workers = min(os.cpu_count() or 1, len(jobs))
+        if workers < 2:
+            for p, anns, outputs, digest in jobs:
+                self._render_job(p, anns, outputs, digest)
+            return
+        # Décodage + dessin + encodage PNG hors du GIL, un processus par cœur
+        rendered = []
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=_process_context()
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _render_reference, p, anns, self._PATHOLOGY_COLORS, outputs
+                ): (Path(p).stem, digest)
+                for p, anns, outputs, digest in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Erreur lors de la génération de l'image de référence: {e}")
+                else:
+                    rendered.append(futures[future])
+        self._store_render_hashes(rendered)
+
+    def _store_annotations(self, image_paths: list[str]) -> None:
+        """Remplace en base les annotations de ces images (une transaction)."""
+        stems = [Path(p).stem for p in image_paths]
+        rows = [
+            _annotation_row(stem, i, p, ann)
+            for stem, p in zip(stems, image_paths)
+            for i, ann in enumerate(self.annotations[p])
+        ]
+        db = self._annotations_db()
+        with db:
+            db.executemany(
+                "DELETE FROM annotations WHERE image = ?", ((s,) for s in stems)
+            )
+            db.executemany(
+                "INSERT INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        # L'ancien JSON ne doit plus masquer la base (ex. annotations supprimées)
+        for stem in stems:
+            (self.annotations_dir / f"{stem}.json").unlink(missing_ok=True)
+
+    # Couleurs des images de référence (RGB Pillow)
+    _PATHOLOGY_COLORS = {
+        "Atelectasis": (255, 0, 0),
+        "Cardiomegaly": (0, 255, 0),
+        "Effusion": (0, 0, 255),
+        "Infiltration": (255, 255, 0),
+        "Mass": (255, 0, 255),
+        "Nodule": (0, 255, 255),
+        "Pneumonia": (255, 165, 0),
+        "Pneumothorax": (255, 20, 147),
+        "Consolidation": (128, 0, 128),
+        "Edema": (0, 128, 255),
+        "Emphysema": (128, 255, 0),
+        "Fibrosis": (255, 128, 0),
+        "Pleural_Thickening": (128, 128, 255),
+        "Hernia": (255, 128, 128),
+        "No Finding": (128, 128, 128),
+    }
+
+    def _reference_outputs(
+        self, image_path: str, annotations: list[dict]
+    ) -> list[Path]:
+        """Chemins de l'image de référence (un par pathologie), dossiers créés."""
+        pathologies = {
+            ann.get("pathology", "Unknown")
+            for ann in annotations
+            if ann.get("type") == "box"
+        }
+        dirs = [
+            self.reference_images_dir / p for p in pathologies if p and p != "Unknown"
+        ]
+        if not pathologies or all(p == "Unknown" for p in pathologies):
+            dirs.append(self.reference_images_dir)
+        name = f"{Path(image_path).stem}_annotated.png"
+        return [self._ensure_dir(d) / name for d in dirs]
+
+    def _reference_job(
+        self, image_path: str, annotations: list[dict]
+    ) -> tuple[list[Path], bytes | None] | None:
+        """(sorties, empreinte) du rendu, ou None s'il est déjà à jour sur disque."""
+        outputs = self._reference_outputs(image_path, annotations)
+        digest = _render_hash(image_path, annotations, outputs)
+        if digest is not None and all(p.exists() for p in outputs):
+            row = (
+                self._annotations_db()
+                .execute(
+                    "SELECT hash FROM renders WHERE image = ?", (Path(image_path).stem,)
+                )
+                .fetchone()
+            )
+            if row is not None and row[0] == digest:
+                return None
+        return outputs, digest
+
+    def _render_job(
+        self,
+        image_path: str,
+        annotations: list[dict],
+        outputs: list[Path],
+        digest: bytes | None,
+    ) -> None:
+        """Rendu dans ce processus, empreinte enregistrée en cas de succès."""
+        try:
+            _render_reference(image_path, annotations, self._PATHOLOGY_COLORS, outputs)
+        except Exception as e:
+            print(f"Erreur lors de la génération de l'image de référence: {e}")
+            return
+        self._store_render_hashes([(Path(image_path).stem, digest)])
+
+    def _store_render_hashes(self, rendered: list[tuple[str, bytes | None]]) -> None:
+        """Mémorise l'empreinte des rendus réussis (None : sans empreinte)."""
+        latest = dict(rendered)  # Plusieurs rendus d'une image : le dernier
+        db = self._annotations_db()
+        with db:
+            db.executemany(
+                "DELETE FROM renders WHERE image = ?", ((s,) for s in latest)
+            )
+            db.executemany(
+                "INSERT INTO renders VALUES (?, ?)",
+                ((s, d) for s, d in latest.items() if d is not None),
+            )
 
     def _generate_reference_image(
         self, image_path: str, annotations: list[dict]
     ) -> None:
-        """Génère une image de référence avec les annotations dessinées."""
+        """Lance en arrière-plan le rendu de l'image de référence (annotations dessinées)."""
+        self._collect_renders()
         try:
-            img = Image.open(image_path).convert("RGB")
-            draw = ImageDraw.Draw(img)
-            colors = {
-                "Atelectasis": (255, 0, 0),
-                "Cardiomegaly": (0, 255, 0),
-                "Effusion": (0, 0, 255),
-                "Infiltration": (255, 255, 0),
-                "Mass": (255, 0, 255),
-                "Nodule": (0, 255, 255),
-                "Pneumonia": (255, 165, 0),
-                "Pneumothorax": (255, 20, 147),
-                "Consolidation": (128, 0, 128),
-                "Edema": (0, 128, 255),
-                "Emphysema": (128, 255, 0),
-                "Fibrosis": (255, 128, 0),
-                "Pleural_Thickening": (128, 128, 255),
-                "Hernia": (255, 128, 128),
-                "No Finding": (128, 128, 128),
-            }
-            pathologies_in_image = set()
-            for ann in annotations:
-                if ann.get("type") != "box":
-                    continue
-                x = int(ann.get("x", 0))
-                y = int(ann.get("y", 0))
-                w = int(ann.get("width", 0))
-                h = int(ann.get("height", 0))
-                pathology = ann.get("pathology", "Unknown")
-                pathologies_in_image.add(pathology)
-                if pathology in colors:
-                    color = colors[pathology]
-                elif isinstance(ann.get("color"), dict):
-                    c = ann["color"]
-                    color = (c.get("r", 255), c.get("g", 0), c.get("b", 0))
-                else:
-                    color = (255, 0, 0)
-                draw.rectangle([x, y, x + w, y + h], outline=color, width=3)
-                try:
-                    try:
-                        font = ImageFont.truetype(
-                            "/System/Library/Fonts/Helvetica.ttc", 16
-                        )
-                    except OSError:
-                        font = ImageFont.load_default()
-                    label = pathology
-                    if ann.get("author"):
-                        label += f" ({ann['author']})"
-                    bbox = draw.textbbox((x, y - 20), label, font=font)
-                    bbox = (bbox[0] - 2, bbox[1] - 2, bbox[2] + 2, bbox[3] + 2)
-                    draw.rectangle(bbox, fill=(0, 0, 0))
-                    draw.text((x, y - 20), label, fill=color, font=font)
-                except Exception:
-                    pass
-            image_stem = Path(image_path).stem
-            for pathology in pathologies_in_image:
-                if pathology and pathology != "Unknown":
-                    pathology_dir = self.reference_images_dir / pathology
-                    pathology_dir.mkdir(exist_ok=True)
-                    output_path = pathology_dir / f"{image_stem}_annotated.png"
-                    img.save(output_path, "PNG")
-            if not pathologies_in_image or all(
-                p == "Unknown" for p in pathologies_in_image
-            ):
-                output_path = self.reference_images_dir / f"{image_stem}_annotated.png"
-                img.save(output_path, "PNG")
+            job = self._reference_job(image_path, annotations)
         except Exception as e:
             print(f"Erreur lors de la génération de l'image de référence: {e}")
+            return
+        if job is None:
+            return
+        outputs, digest = job
+        stem = Path(image_path).stem
+        # Même rendu déjà en file : empreinte pas encore en base
+        if digest is not None and any(
+            s == stem and d == digest for _, s, d in self._pending_renders
+        ):
+            return
+        if self._ref_pool is None:
+            # Un seul thread : les rendus d'une même image restent ordonnés
+            self._ref_pool = ThreadPoolExecutor(max_workers=1)
+        future = self._ref_pool.submit(
+            _render_reference, image_path, annotations, self._PATHOLOGY_COLORS, outputs
+        )
+        self._pending_renders.append((future, stem, digest))
+
+    def _collect_renders(self, wait: bool = False) -> None:
+        """Enregistre les empreintes des rendus terminés (tous si wait)."""
+        rendered = []
+        while self._pending_renders and (wait or self._pending_renders[0][0].done()):
+            future, stem, digest = self._pending_renders.pop(0)
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Erreur lors de la génération de l'image de référence: {e}")
+            else:
+                rendered.append((stem, digest))
+        # Connexion SQLite du thread principal : empreintes écrites ici
+        if rendered:
+            self._store_render_hashes(rendered)
+
+    def wait_for_renders(self) -> None:
+        """Attend la fin des rendus de référence lancés par save_annotations."""
+        self._collect_renders(wait=True)
 
-    def _load_bbox_from_csv(self, csv_path: Path) -> None:
-        """Charge les bounding boxes NIH comme annotations initiales."""
+    def close(self) -> None:
+        """Attend les rendus de référence en cours et arrête leur thread."""
+        self.wait_for_renders()
+        if self._ref_pool is not None:
+            self._ref_pool.shutdown()
+            self._ref_pool = None
+
+    def _load_bbox_from_csv(self, csv_path: Path | io.BytesIO) -> None:
+        """Charge les bounding boxes NIH (fichier ou contenu déjà lu) comme annotations."""
         try:
-            with open(csv_path, encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    image_name = row.get("Image Index")
-                    if not image_name:
-                        continue
-                    image_path = self.dataset_path / image_name
-                    if not image_path.exists():
-                        image_path = self.dataset_path / "images" / image_name
-                    if not image_path.exists():
-                        continue
-                    key = str(image_path)
-                    if key not in self.annotations:
-                        self.annotations[key] = []
-                    try:
-                        bbox_str = row.get("Bbox [x,y,w,h]", "")
-                        if not bbox_str:
-                            continue
-                        parts = bbox_str.split(",")
-                        if len(parts) < 4:
-                            continue
-                        x, y, w, h = (
-                            float(parts[0]),
-                            float(parts[1]),
-                            float(parts[2]),
-                            float(parts[3]),
-                        )
-                    except (ValueError, TypeError) as e:
-                        print(f"Erreur parsing bbox pour {image_name}: {e}")
-                        continue
-                    pathology = row.get("Finding Label", "")
-                    self.annotations[key].append(
+            if isinstance(csv_path, Path):
+                csv_path = io.BytesIO(_read_seq(csv_path))
+            df = pd.read_csv(
+                csv_path, dtype=str, keep_default_na=False, encoding="utf-8"
+            ).fillna("")
+            if "Image Index" not in df.columns:
+                return
+            if "Bbox [x,y,w,h]" in df.columns:
+                parts = df["Bbox [x,y,w,h]"].str.split(",", expand=True)
+                coords = parts.iloc[:, :4] if parts.shape[1] >= 4 else None
+            else:
+                # En-tête NIH non quoté : "Bbox [x", "y", "w", "h]" en 4 colonnes
+                start = (
+                    df.columns.get_loc("Finding Label") + 1
+                    if "Finding Label" in df.columns
+                    else 2
+                )
+                coords = df.iloc[:, start : start + 4]
+                if coords.shape[1] < 4:
+                    coords = None
+            if coords is None:
+                return
+            coords = coords.fillna("").apply(lambda c: c.str.strip())
+            present = (coords != "").all(axis=1)
+            values = coords.apply(pd.to_numeric, errors="coerce").astype("float64")
+            valid = (present & values.notna().all(axis=1)).tolist()
+            xs, ys, ws, hs = (values[c].tolist() for c in values.columns)
+            names = df["Image Index"].tolist()
+            findings = (
+                df["Finding Label"].tolist()
+                if "Finding Label" in df.columns
+                else [""] * len(df)
+            )
+            for name, ok, has_bbox in zip(names, valid, present.tolist()):
+                if has_bbox and not ok:
+                    print(f"Erreur parsing bbox pour {name}: coordonnées invalides")
+            # Lignes groupées par image (ordre du CSV) : une résolution par image,
+            # une liste construite d'un coup ; date commune à tout le chargement
+            now_iso = datetime.now().isoformat()
+            groups = df.groupby("Image Index", sort=False).indices
+            for image_name, group in groups.items():
+                if not image_name:
+                    continue
+                key = self._resolve_image(image_name)
+                if key is None:
+                    continue
+                self.annotations.setdefault(key, []).extend(
+                    [
                         {
                             "type": "box",
-                            "x": x,
-                            "y": y,
-                            "width": w,
-                            "height": h,
-                            "pathology": pathology,
+                            "x": xs[r],
+                            "y": ys[r],
+                            "width": ws[r],
+                            "height": hs[r],
+                            "pathology": sys.intern(findings[r]),
                             "author": "auto_bbox",
-                            "date": datetime.now().isoformat(),
+                            "date": now_iso,
                             "confidence": 0.5,
                         }
-                    )
+                        for r in group.tolist()
+                        if valid[r]
+                    ]
+                )
         except Exception as e:
             print(f"Erreur lors du chargement des bounding boxes: {e}")
 
     def _load_metadata_from_csv(self, csv_path: Path, root_for_csv: Path) -> None:
         """Charge les métadonnées depuis un fichier CSV (Data_Entry NIH)."""
         try:
-            with open(csv_path, encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    image_name = row.get("Image Index", row.get("filename", ""))
-                    if not image_name:
-                        continue
-                    image_path = self.dataset_path / image_name
-                    if not image_path.exists():
-                        image_path = self.dataset_path / "images" / image_name
-                    if not image_path.exists():
-                        continue
-                    follow_up = row.get("Follow-up #", "000")
-                    try:
-                        follow_num = int(follow_up)
-                        base_date = datetime(2000, 1, 1)
-                        date = (base_date + timedelta(days=follow_num)).strftime(
-                            "%Y-%m-%d"
-                        )
-                    except ValueError:
-                        date = datetime.now().strftime("%Y-%m-%d")
-                    self.metadata[str(image_path)] = {
-                        "patient_id": row.get("Patient ID", ""),
-                        "age": row.get("Patient Age", ""),
-                        "sex": row.get("Patient Gender", ""),
-                        "view": row.get("View Position", ""),
-                        "date": date,
-                        "pathologies": self._parse_pathologies(row),
-                        "filename": image_name,
-                    }
+            try:
+                # Colonnes utiles seulement, lues en texte par le moteur C de pandas
+                with _open_seq(csv_path) as f:
+                    df = pd.read_csv(
+                        f,
+                        usecols=lambda c: c in _METADATA_COLUMNS,
+                        dtype=str,
+                        keep_default_na=False,
+                        encoding="utf-8",
+                    ).fillna("")
+            except pd.errors.EmptyDataError:
+                return
+            # Colonne image résolue une fois
+            image_key = next(
+                (k for k in ("Image Index", "filename") if k in df.columns), None
+            )
+            if image_key is None:
+                return
+            n = len(df)
+            _intern = sys.intern
+
+            def column(name: str) -> list[str]:
+                return df[name].tolist() if name in df.columns else [""] * n
+
+            # Dates vectorisées : 2000-01-01 + Follow-up # jours (entier), sinon aujourd'hui
+            if "Follow-up #" in df.columns:
+                follow = pd.to_numeric(df["Follow-up #"].str.strip(), errors="coerce")
+                follow = follow.where(follow % 1 == 0)
+            else:
+                follow = pd.Series(0, index=df.index)
+            # Peu de valeurs distinctes : formatage sur les uniques, puis indexation
+            codes, uniques = pd.factorize(follow)
+            formatted = (
+                (_BASE_DATE + pd.to_timedelta(uniques, unit="D"))
+                .strftime("%Y-%m-%d")
+                .tolist()
+            )
+            formatted.append(datetime.now().strftime("%Y-%m-%d"))  # code -1 (NaN)
+            dates = [formatted[c] for c in codes.tolist()]
+            labels = column("Finding Labels")
+            if "Finding Label" in df.columns:
+                labels = [a or b for a, b in zip(labels, df["Finding Label"].tolist())]
+            parsed = {v: self._parse_labels(v) for v in set(labels)}
+            names = df[image_key].tolist()
+            get = self._image_name_index.get
+            resolved = [get(name) for name in names]
+            for i in [i for i, path in enumerate(resolved) if path is None]:
+                if names[i]:
+                    resolved[i] = self._resolve_image(names[i])
+            keep = [i for i, path in enumerate(resolved) if path is not None]
+
+            def kept(values: list, intern: bool = True) -> list:
+                if intern:
+                    return [_intern(values[i]) for i in keep]
+                return [values[i] for i in keep]
+
+            # Colonnes ajoutées telles quelles ; valeurs répétées partagées via intern.
+            # Les listes de pathologies sont partagées (copiées à la lecture).
+            self.metadata.extend(
+                kept(resolved, intern=False),
+                {
+                    "patient_id": kept(column("Patient ID")),
+                    "age": kept(column("Patient Age")),
+                    "sex": kept(column("Patient Gender")),
+                    "view": kept(column("View Position")),
+                    "date": kept(dates),
+                    "pathologies": [parsed[labels[i]] for i in keep],
+                    "filename": kept(names, intern=False),
+                },
+            )
         except Exception as e:
             print(f"Erreur lors du chargement du CSV: {e}")
             self._generate_default_metadata()
@@ -276,23 +1158,34 @@ class DataManager:
     def _parse_pathologies(self, row: dict) -> list[str]:
         """Parse les pathologies depuis une ligne CSV (Finding Labels)."""
         labels = row.get("Finding Labels") or row.get("Finding Label") or ""
+        return self._parse_labels(labels)
+
+    @staticmethod
+    def _parse_labels(labels: str) -> list[str]:
+        """Parse une valeur Finding Labels ("A|B", "No Finding" -> [])."""
         labels = labels.strip()
         if not labels or labels == "No Finding":
             return []
-        return [lbl.strip() for lbl in labels.split("|") if lbl.strip()]
+        return [sys.intern(lbl.strip()) for lbl in labels.split("|") if lbl.strip()]
 
     def _generate_default_metadata(self) -> None:
         """Génère des métadonnées par défaut pour les images."""
-        for img_path in self.images:
-            self.metadata[str(img_path)] = {
-                "patient_id": f"P{hash(str(img_path)) % 10000:04d}",
-                "age": "Unknown",
-                "sex": "Unknown",
-                "view": "PA",
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "pathologies": [],
-                "filename": img_path.name,
-            }
+        today = datetime.now().strftime("%Y-%m-%d")
+        n = len(self.images)
+        # Identifiant = rang dans la liste triée : unique et stable d'un lancement
+        # à l'autre (hash() de str est aléatoire par processus)
+        self.metadata.extend(
+            self.images,
+            {
+                "patient_id": [f"P{i:06d}" for i in range(n)],
+                "age": ["Unknown"] * n,
+                "sex": ["Unknown"] * n,
+                "view": ["PA"] * n,
+                "date": [today] * n,
+                "pathologies": [[] for _ in range(n)],
+                "filename": [os.path.basename(p) for p in self.images],
+            },
+        )
 
     def get_current_image(self) -> str | None:
         """Retourne le chemin de l'image actuelle."""
@@ -300,6 +1193,15 @@ class DataManager:
             return str(self.images[self.current_image_index])
         return None
 
+    def get_image_index(self, image_path: str) -> int | None:
+        """Retourne la position d'une image dans self.images (None si absente)."""
+        if self._image_index_of is not self.images or len(self._image_index) != len(
+            self.images
+        ):
+            self._image_index = {str(p): i for i, p in enumerate(self.images)}
+            self._image_index_of = self.images
+        return self._image_index.get(str(image_path))
+
     def get_image_metadata(self, image_path: str) -> dict:
         """Retourne les métadonnées d'une image."""
         return self.metadata.get(image_path, {})
@@ -310,71 +1212,119 @@ class DataManager:
 
     def get_statistics(self) -> dict:
         """Retourne les statistiques des annotations."""
-        stats = {
+        annotations = self.annotations
+        if not isinstance(annotations, AnnotationTable):
+            # dict ordinaire affecté de l'extérieur : recompté à chaque appel
+            annotations = AnnotationTable(annotations)
+        parts = self._stats_parts
+        totals = self._stats_totals
+        if annotations is not self._stats_of:
+            parts.clear()
+            totals[:] = [0, 0, Counter(), Counter()]
+            self._stats_of = annotations
+            self._stats_dirty = annotations.watch()
+        # Seules les images touchées depuis le dernier appel sont recomptées
+        for path in self._stats_dirty:
+            old = parts.pop(path, None)
+            if old is not None:
+                totals[0] -= 1
+                totals[1] -= old[0]
+                totals[2] -= old[1]
+                totals[3] -= old[2]
+            annos = dict.get(annotations, path)
+            if annos:
+                part = (
+                    len(annos),
+                    Counter(ann.get("pathology", "Unknown") for ann in annos),
+                    Counter(ann.get("author", "Unknown") for ann in annos),
+                )
+                parts[path] = part
+                totals[0] += 1
+                totals[1] += part[0]
+                totals[2] += part[1]
+                totals[3] += part[2]
+        self._stats_dirty.clear()
+        return {
             "total_images": len(self.images),
-            "annotated_images": sum(1 for annos in self.annotations.values() if annos),
-            "total_annotations": sum(len(annos) for annos in self.annotations.values()),
-            "annotations_by_pathology": {},
-            "annotations_by_author": {},
+            "annotated_images": totals[0],
+            "total_annotations": totals[1],
+            "annotations_by_pathology": dict(totals[2]),
+            "annotations_by_author": dict(totals[3]),
             "average_time": 0,
         }
-        for annotations in self.annotations.values():
-            for ann in annotations:
-                path = ann.get("pathology", "Unknown")
-                stats["annotations_by_pathology"][path] = (
-                    stats["annotations_by_pathology"].get(path, 0) + 1
-                )
-                author = ann.get("author", "Unknown")
-                stats["annotations_by_author"][author] = (
-                    stats["annotations_by_author"].get(author, 0) + 1
-                )
-        return stats
+
+    def _image_rows(self) -> np.ndarray:
+        """Ligne de métadonnées de chaque image, recalculée si images/metadata changent."""
+        images, table = self.images, self.metadata
+        cached = self._image_rows_cache
+        if (
+            cached is None
+            or cached[0] is not images
+            or cached[1] != len(images)
+            or cached[2] is not table
+            or cached[3] != len(table)
+        ):
+            cached = (images, len(images), table, len(table), table.rows(images))
+            self._image_rows_cache = cached
+        return cached[4]
 
     def filter_images(self, filters: dict) -> list[str]:
-        """Filtre les images selon les critères."""
-        filtered = []
-        for img_path in self.images:
-            metadata = self.get_image_metadata(str(img_path))
-            match = True
-            if filters.get("pathology") and filters["pathology"] != "Toutes":
-                if filters["pathology"] not in metadata.get("pathologies", []):
-                    match = False
-            if filters.get("sex") and filters["sex"] != "Tous":
-                if metadata.get("sex", "").upper() != filters["sex"].upper():
-                    match = False
-            if filters.get("view") and filters["view"] != "Toutes":
-                if (
-                    metadata.get("view", "").strip().upper()
-                    != filters["view"].strip().upper()
-                ):
-                    match = False
+        """Filtre les images selon les critères (masques sur les colonnes)."""
+        table = self.metadata
+        rows = self._image_rows()
+        # Positions encore candidates : chaque critère ne s'applique qu'aux
+        # survivants du précédent (la pathologie, la plus sélective, d'abord)
+        pos = np.arange(len(rows))
+
+        def keep(mask: np.ndarray) -> None:
+            nonlocal pos, rows
+            pos, rows = pos[mask], rows[mask]
+
+        if filters.get("pathology") and filters["pathology"] != "Toutes":
+            pathology = filters["pathology"]
+            if pathology in self.PATHOLOGY_ORDER:
+                # Masques de bits partagés par les 14 pathologies (et la
+                # co-occurrence) : un test de bit au lieu d'une passe par label
+                bit = 1 << self.PATHOLOGY_ORDER.index(pathology)
+                masks = table.label_masks(tuple(self.PATHOLOGY_ORDER))[rows]
+                keep((masks >= 0) & (masks & bit != 0))
+            else:
+                keep(table.has_pathology(pathology)[rows])
+        if filters.get("sex") and filters["sex"] != "Tous":
+            keep(table.column("sex", _upper)[rows] == filters["sex"].upper())
+        if filters.get("view") and filters["view"] != "Toutes":
+            views = table.column("view", _strip_upper)[rows]
+            keep(views == filters["view"].strip().upper())
+        if filters.get("date_min") or filters.get("date_max"):
+            # Rangs des dates (ordre des chaînes) : une recherche par borne,
+            # puis comparaisons d'entiers
+            dates, codes = table.column_codes("date", _date)
             if filters.get("date_min"):
-                if (metadata.get("date", "") or "") < filters["date_min"]:
-                    match = False
+                low = np.searchsorted(dates, filters["date_min"], side="left")
+                keep(codes[rows] >= low)
             if filters.get("date_max"):
-                if (metadata.get("date", "") or "") > filters["date_max"]:
-                    match = False
+                high = np.searchsorted(dates, filters["date_max"], side="right")
+                keep(codes[rows] < high)
+        if filters.get("age_min") or filters.get("age_max"):
+            # Âge illisible (NaN) : critère ignoré
+            ages = table.column("age", _age)[rows].astype(float)
+            unknown = np.isnan(ages)
+            match = np.ones(len(rows), dtype=bool)
             if filters.get("age_min"):
-                try:
-                    age = int(str(metadata.get("age", "0")).replace("Y", ""))
-                    if age < filters["age_min"]:
-                        match = False
-                except ValueError:
-                    pass
+                match &= unknown | ~(ages < filters["age_min"])
             if filters.get("age_max"):
-                try:
-                    age = int(str(metadata.get("age", "0")).replace("Y", ""))
-                    if age > filters["age_max"]:
-                        match = False
-                except ValueError:
-                    pass
-            if filters.get("has_annotations") is not None:
-                has_annos = len(self.get_image_annotations(str(img_path))) > 0
-                if has_annos != filters["has_annotations"]:
-                    match = False
-            if match:
-                filtered.append(str(img_path))
-        return filtered
+                match &= unknown | ~(ages > filters["age_max"])
+            keep(match)
+        images = self.images
+        if filters.get("has_annotations") is not None:
+            annotations = self.annotations
+            wanted = bool(filters["has_annotations"])
+            return [
+                images[i]
+                for i in pos.tolist()
+                if bool(annotations.get(images[i])) == wanted
+            ]
+        return [images[i] for i in pos.tolist()]
 
     PATHOLOGY_ORDER = [
         "Atelectasis",
@@ -397,27 +1347,30 @@ class DataManager:
         self, from_csv_only: bool = True
     ) -> tuple[list[str], list[list[int]]]:
         """Matrice de co-occurrence des pathologies (métadonnées CSV ou annotations)."""
+        # Métadonnées seules : cache valable jusqu'au prochain load_dataset
+        # (les annotations sont modifiées en place par l'UI, pas de cache).
+        if from_csv_only and self._cooccurrence_cache is not None:
+            labels, matrix = self._cooccurrence_cache
+            return list(labels), [row[:] for row in matrix]
         labels = list(self.PATHOLOGY_ORDER)
-        n = len(labels)
-        label_to_idx = {p: i for i, p in enumerate(labels)}
-        matrix = [[0] * n for _ in range(n)]
-        for img_path in self.images:
-            path_str = str(img_path)
-            pathologies = set(self.metadata.get(path_str, {}).get("pathologies", []))
-            if not pathologies and not from_csv_only:
-                for ann in self.annotations.get(path_str, []):
-                    p = ann.get("pathology")
-                    if p and p in label_to_idx:
-                        pathologies.add(p)
-            for p1 in pathologies:
-                if p1 not in label_to_idx:
-                    continue
-                idx1 = label_to_idx[p1]
-                for p2 in pathologies:
-                    if p2 not in label_to_idx:
-                        continue
-                    idx2 = label_to_idx[p2]
-                    matrix[idx1][idx2] += 1
+        key = tuple(labels)
+        rows = self._image_rows()
+        # Une ligne par image, une colonne par pathologie (copie : indexation)
+        incidence = self.metadata.label_matrix(key)[rows]
+        if not from_csv_only:
+            label_to_idx = {p: i for i, p in enumerate(labels)}
+            # Rejet vectorisé : seules les images sans pathologie (masque -1)
+            # passent par leurs annotations
+            unlabelled = self.metadata.label_masks(key)[rows] < 0
+            for k in np.flatnonzero(unlabelled).tolist():
+                for ann in self.annotations.get(self.images[k], []):
+                    i = label_to_idx.get(ann.get("pathology"))
+                    if i is not None:
+                        incidence[k, i] = 1.0
+        # Co-occurrence = M^T M (un seul produit matriciel, exact en float64)
+        matrix = (incidence.T @ incidence).astype(np.int64).tolist()
+        if from_csv_only:
+            self._cooccurrence_cache = (list(labels), [row[:] for row in matrix])
         return labels, matrix
 
     def add_annotation(self, image_path: str, annotation: dict) -> None:
@@ -442,6 +1395,66 @@ class DataManager:
         ):
             del self.annotations[image_path][annotation_id]
 
+    def _pathology_index(self) -> tuple[dict[str, set[str]], dict[str, int]]:
+        """(pathologie -> images ayant une boîte de cette pathologie, rang des images).
+
+        Tenu à jour avec les seules images touchées depuis l'appel précédent ;
+        le rang suit l'ordre de self.annotations.
+        """
+        annotations = self.annotations
+        if not isinstance(annotations, AnnotationTable):
+            # dict ordinaire affecté de l'extérieur : index reconstruit à chaque appel
+            annotations = AnnotationTable(annotations)
+        index, labels, pos = self._ref_index, self._ref_labels, self._ref_pos
+        if annotations is not self._ref_of:
+            index.clear()
+            labels.clear()
+            pos.clear()
+            pos.update((path, i) for i, path in enumerate(annotations))
+            self._ref_next = len(pos)
+            self._ref_of = annotations
+            self._ref_dirty = annotations.watch()
+        for path in self._ref_dirty:
+            for p in labels.pop(path, ()):
+                index[p].discard(path)
+            annos = dict.get(annotations, path)
+            if annos is None:
+                pos.pop(path, None)
+                continue
+            if path not in pos:
+                pos[path] = self._ref_next
+                self._ref_next += 1
+            found = {a.get("pathology") for a in annos if _is_box(a)}
+            if found:
+                labels[path] = found
+                for p in found:
+                    index.setdefault(p, set()).add(path)
+        self._ref_dirty.clear()
+        return index, pos
+
+    def _resolve_path(self, path: str | None) -> str | None:
+        """str(Path(path).resolve()), mémorisé par chemin."""
+        if not path:
+            return None
+        resolved = self._resolved.get(path)
+        if resolved is None:
+            resolved = self._resolved[path] = str(Path(path).resolve())
+        return resolved
+
+    def _images_by_stem(self) -> dict[str, list[str]]:
+        """Nom sans extension -> images (ordre de self.images), gardé tant qu'elles ne changent pas."""
+        cached = self._stem_index
+        if (
+            cached is None
+            or cached[0] is not self.images
+            or cached[1] != len(self.images)
+        ):
+            by_stem: dict[str, list[str]] = {}
+            for p in self.images:
+                by_stem.setdefault(Path(p).stem, []).append(p)
+            cached = self._stem_index = (self.images, len(self.images), by_stem)
+        return cached[2]
+
     def get_reference_images_for_pathology(
         self,
         pathology: str,
@@ -449,36 +1462,36 @@ class DataManager:
         exclude_path: str | None = None,
     ) -> list[tuple[str, list[dict]]]:
         """Images de référence avec annotations pour cette pathologie."""
-
-        def _norm(p: str | None) -> str | None:
-            return str(Path(p).resolve()) if p else None
-
+        _norm = self._resolve_path
         exclude_norm = _norm(exclude_path)
         result: list[tuple[str, list[dict]]] = []
         seen_paths: set = set()  # set of normalized paths
-        for img_path, ann_list in self.annotations.items():
+        # Seules les images ayant une boîte de cette pathologie sont parcourues,
+        # dans l'ordre de self.annotations
+        index, pos = self._pathology_index()
+        for img_path in sorted(index.get(pathology, ()), key=pos.__getitem__):
             img_path_str = str(img_path)
-            if exclude_norm and _norm(img_path_str) == exclude_norm:
+            norm = _norm(img_path_str)
+            if exclude_norm and norm == exclude_norm:
                 continue
             for_pathology = [
                 a
-                for a in ann_list
-                if a.get("pathology") == pathology
-                and (a.get("type") == "box" or ("x" in a and "width" in a))
+                for a in self.annotations.get(img_path, [])
+                if a.get("pathology") == pathology and _is_box(a)
             ]
-            if for_pathology and _norm(img_path_str) not in seen_paths:
+            if for_pathology and norm not in seen_paths:
                 result.append((img_path_str, for_pathology))
-                seen_paths.add(_norm(img_path_str))
+                seen_paths.add(norm)
             if len(result) >= limit:
                 return result
         refs_dir = Path(__file__).resolve().parent / "pathology_references"
         ref_file = refs_dir / f"{pathology.replace(' ', '_')}.json"
         if ref_file.exists() and self.images:
             try:
-                with open(ref_file, encoding="utf-8") as f:
-                    examples = json.load(f)
+                examples = _json_loads(ref_file.read_bytes())
             except Exception:
                 examples = []
+            by_stem = self._images_by_stem()
             for ex in examples:
                 if len(result) >= limit:
                     break
@@ -486,13 +1499,11 @@ class DataManager:
                 anns = ex.get("annotations", [])
                 if not stem or not anns:
                     continue
-                for img_path in self.images:
-                    if (
-                        Path(img_path).stem == stem
-                        and _norm(str(img_path)) not in seen_paths
-                    ):
+                for img_path in by_stem.get(stem, ()):
+                    norm = _norm(img_path)
+                    if norm not in seen_paths:
                         result.append((str(img_path), anns))
-                        seen_paths.add(_norm(str(img_path)))
+                        seen_paths.add(norm)
                         break
         if not result and exclude_path:
             ann_list = self.annotations.get(exclude_path) or self.annotations.get(
@@ -508,8 +1519,7 @@ class DataManager:
                 for_pathology = [
                     a
                     for a in ann_list
-                    if a.get("pathology") == pathology
-                    and (a.get("type") == "box" or ("x" in a and "width" in a))
+                    if a.get("pathology") == pathology and _is_box(a)
                 ]
                 if for_pathology:
                     result.append((str(exclude_path), for_pathology))
@@ -551,12 +1561,12 @@ class DataManager:
                     "metadata": self.get_image_metadata(img_path),
                     "annotations": self._serialize_annotations_for_export(annotations),
                 }
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(all_data, f, indent=2, ensure_ascii=False)
+        Path(filename).write_bytes(_json_dumps(all_data, indent=True))
 
     def _export_csv(self, filename: str) -> None:
         """Exporte en CSV."""
-        with open(filename, "w", newline="", encoding="utf-8") as f:
+        # Tampon de 64 Kio : écritures disque par blocs, pas par ligne
+        with open(filename, "w", buffering=1 << 16, newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(
                 [
@@ -571,21 +1581,40 @@ class DataManager:
                     "Confidence",
                 ]
             )
-            for img_path, annotations in self.annotations.items():
-                for ann in annotations:
-                    writer.writerow(
-                        [
-                            img_path,
-                            ann.get("pathology", ""),
-                            ann.get("x", 0),
-                            ann.get("y", 0),
-                            ann.get("width", 0),
-                            ann.get("height", 0),
-                            ann.get("author", ""),
-                            ann.get("date", ""),
-                            ann.get("confidence", 1.0),
-                        ]
-                    )
+            # writerows consomme le générateur en C : pas de liste intermédiaire
+            writer.writerows(
+                (
+                    img_path,
+                    ann.get("pathology", ""),
+                    ann.get("x", 0),
+                    ann.get("y", 0),
+                    ann.get("width", 0),
+                    ann.get("height", 0),
+                    ann.get("author", ""),
+                    ann.get("date", ""),
+                    ann.get("confidence", 1.0),
+                )
+                for img_path, annotations in self.annotations.items()
+                for ann in annotations
+            )
+
+    def _image_size(self, image_path: str) -> tuple[int, int]:
+        """(largeur, hauteur) lue dans l'en-tête, mémorisée ; 1024x1024 si illisible."""
+        size = self._image_sizes.get(image_path)
+        if size is None:
+            try:
+                # Image.open ne lit que l'en-tête ; le with referme le fichier
+                with Image.open(image_path) as img:
+                    size = img.size
+            except Exception:
+                size = (1024, 1024)
+            self._image_sizes[image_path] = size
+        return size
+
+    def _annotated_pathologies(self) -> list[str]:
+        """Pathologies présentes (triées), tirées des compteurs de get_statistics."""
+        # Compteurs tenus à jour image par image : pas de parcours complet
+        return sorted(self.get_statistics()["annotations_by_pathology"])
 
     def _export_coco(self, filename: str) -> None:
         """Exporte en format COCO."""
@@ -595,11 +1624,9 @@ class DataManager:
             "annotations": [],
             "categories": [],
         }
-        pathologies = set()
-        for annotations in self.annotations.values():
-            for ann in annotations:
-                pathologies.add(ann.get("pathology", "Unknown"))
-        category_map = {path: idx + 1 for idx, path in enumerate(sorted(pathologies))}
+        category_map = {
+            path: idx + 1 for idx, path in enumerate(self._annotated_pathologies())
+        }
         coco_data["categories"] = [
             {"id": idx, "name": name} for name, idx in category_map.items()
         ]
@@ -607,11 +1634,7 @@ class DataManager:
         for img_path, annotations in self.annotations.items():
             if not annotations:
                 continue
-            try:
-                img = Image.open(img_path)
-                width, height = img.size
-            except Exception:
-                width, height = 1024, 1024
+            width, height = self._image_size(img_path)
             image_id = len(coco_data["images"]) + 1
             coco_data["images"].append(
                 {
@@ -640,44 +1663,39 @@ class DataManager:
                     }
                 )
                 annotation_id += 1
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(coco_data, f, indent=2, ensure_ascii=False)
+        Path(filename).write_bytes(_json_dumps(coco_data, indent=True))
 
     def _export_yolo(self, filename: str) -> None:
         """Exporte en YOLO (dossier yolo_annotations + classes.txt)."""
         output_dir = Path(filename).parent / "yolo_annotations"
         output_dir.mkdir(exist_ok=True)
-        pathologies = set()
-        for annotations in self.annotations.values():
-            for ann in annotations:
-                pathologies.add(ann.get("pathology", "Unknown"))
-        with open(output_dir / "classes.txt", "w", encoding="utf-8") as f:
-            for path in sorted(pathologies):
-                f.write(f"{path}\n")
-        category_map = {path: idx for idx, path in enumerate(sorted(pathologies))}
+        classes = self._annotated_pathologies()
+        # (fichier, contenu) : chaque fichier écrit d'un bloc
+        outputs = [(output_dir / "classes.txt", "".join(f"{p}\n" for p in classes))]
+        category_map = {path: idx for idx, path in enumerate(classes)}
         for img_path, annotations in self.annotations.items():
             if not annotations:
                 continue
-            try:
-                img = Image.open(img_path)
-                img_width, img_height = img.size
-            except Exception:
-                img_width, img_height = 1024, 1024
-            txt_file = output_dir / f"{Path(img_path).stem}.txt"
-            with open(txt_file, "w", encoding="utf-8") as f:
-                for ann in annotations:
-                    x = ann.get("x", 0)
-                    y = ann.get("y", 0)
-                    w = ann.get("width", 0)
-                    h = ann.get("height", 0)
-                    center_x = (x + w / 2) / img_width
-                    center_y = (y + h / 2) / img_height
-                    norm_w = w / img_width
-                    norm_h = h / img_height
-                    class_id = category_map.get(ann.get("pathology", "Unknown"), 0)
-                    f.write(
-                        f"{class_id} {center_x:.6f} {center_y:.6f} {norm_w:.6f} {norm_h:.6f}\n"
-                    )
+            img_width, img_height = self._image_size(img_path)
+            lines = []
+            for ann in annotations:
+                x = ann.get("x", 0)
+                y = ann.get("y", 0)
+                w = ann.get("width", 0)
+                h = ann.get("height", 0)
+                center_x = (x + w / 2) / img_width
+                center_y = (y + h / 2) / img_height
+                norm_w = w / img_width
+                norm_h = h / img_height
+                class_id = category_map.get(ann.get("pathology", "Unknown"), 0)
+                lines.append(
+                    f"{class_id} {center_x:.6f} {center_y:.6f} {norm_w:.6f} {norm_h:.6f}\n"
+                )
+            outputs.append((output_dir / f"{Path(img_path).stem}.txt", "".join(lines)))
+        # Beaucoup de petits fichiers : écritures parallèles (E/S, hors GIL)
+        with ThreadPoolExecutor(max_workers=min(8, len(outputs))) as pool:
+            for _ in pool.map(_write_text, outputs):
+                pass
 
     def import_annotations(self, filename: str) -> None:
         """Importe des annotations depuis un fichier JSON ou CSV."""
@@ -689,8 +1707,7 @@ class DataManager:
 
     def _import_json(self, filename: str) -> None:
         """Importe depuis JSON (convertit couleurs dict -> QColor)."""
-        with open(filename, encoding="utf-8") as f:
-            data = json.load(f)
+        data = _json_loads(Path(filename).read_bytes())
         if not isinstance(data, dict):
             return
         for img_path, img_data in data.items():
@@ -700,36 +1717,53 @@ class DataManager:
                 annotations = img_data
             else:
                 continue
-            for ann in annotations:
-                if "color" in ann and isinstance(ann["color"], dict):
-                    c = ann["color"]
-                    ann["color"] = QColor(
-                        c.get("r", 255),
-                        c.get("g", 0),
-                        c.get("b", 0),
-                        c.get("a", 255),
-                    )
+            _restore_loaded(annotations)
             self.annotations[img_path] = annotations
 
     def _import_csv(self, filename: str) -> None:
         """Importe depuis CSV."""
-        with open(filename, encoding="utf-8") as f:
-            reader = csv.DictReader(f)
+        with open(filename, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            # Position de chaque colonne résolue une fois (None si absente)
+            idx = {name: i for i, name in enumerate(header)}
+            i_img, i_patho, i_x, i_y, i_w, i_h, i_author, i_date, i_conf = (
+                idx.get(name)
+                for name in (
+                    "Image",
+                    "Pathology",
+                    "X",
+                    "Y",
+                    "Width",
+                    "Height",
+                    "Author",
+                    "Date",
+                    "Confidence",
+                )
+            )
+
+            def cell(row: list[str], i: int | None, default: object = "") -> object:
+                return row[i] if i is not None and i < len(row) else default
+
+            intern = sys.intern
+
             for row in reader:
-                img_path = row.get("Image", "")
+                img_path = cell(row, i_img)
                 if not img_path:
                     continue
                 if img_path not in self.annotations:
                     self.annotations[img_path] = []
                 self.annotations[img_path].append(
                     {
-                        "pathology": row.get("Pathology", ""),
-                        "x": float(row.get("X", 0)),
-                        "y": float(row.get("Y", 0)),
-                        "width": float(row.get("Width", 0)),
-                        "height": float(row.get("Height", 0)),
-                        "author": row.get("Author", ""),
-                        "date": row.get("Date", ""),
-                        "confidence": float(row.get("Confidence", 1.0)),
+                        "pathology": intern(cell(row, i_patho)),
+                        "x": float(cell(row, i_x, 0)),
+                        "y": float(cell(row, i_y, 0)),
+                        "width": float(cell(row, i_w, 0)),
+                        "height": float(cell(row, i_h, 0)),
+                        "author": intern(cell(row, i_author)),
+                        "date": cell(row, i_date),
+                        "confidence": float(cell(row, i_conf, 1.0)),
                     }
                 )
@@ -1,37 +1,142 @@
 """Point d'entrée Qt (PySide6) pour l'outil d'étiquetage de radiographies."""
 
+import os
 import sys
+from collections.abc import Callable
 from pathlib import Path
 
-from PySide6.QtGui import QKeySequence, QShortcut
+from PySide6.QtCore import QObject, QRunnable, QSettings, Qt, QThreadPool, Signal
+from PySide6.QtGui import (
+    QAction,
+    QCloseEvent,
+    QKeySequence,
+    QPixmapCache,
+    QShortcut,
+)
 from PySide6.QtWidgets import (
     QApplication,
-    QComboBox,
     QDialog,
-    QDialogButtonBox,
     QFileDialog,
-    QLabel,
     QMainWindow,
     QMessageBox,
+    QProgressDialog,
     QTabWidget,
-    QVBoxLayout,
+    QWidget,
 )
 
 from pai_2025_outil_etiquetage_radiographies import analysis_export
-from pai_2025_outil_etiquetage_radiographies.annotations_tab import AnnotationsTab
+from pai_2025_outil_etiquetage_radiographies.annotations_tab import (
+    PIXMAP_CACHE_LIMIT_KB,
+    AnnotationsTab,
+)
 from pai_2025_outil_etiquetage_radiographies.auth_dialog import AuthDialog
 from pai_2025_outil_etiquetage_radiographies.data_manager import DataManager
 from pai_2025_outil_etiquetage_radiographies.stats_dialog import StatsDialog
 from pai_2025_outil_etiquetage_radiographies.visualization_tab import VisualizationTab
 
 
+class _TaskNotifier(QObject):
+    """Fin d'une tâche de fond (résultat, message d'erreur vide si succès)."""
+
+    finished = Signal(object, str)
+
+
+class _BackgroundTask(QRunnable):
+    """Appel func(*args) hors du thread GUI (chargement, export)."""
+
+    def __init__(
+        self, notifier: _TaskNotifier, func: Callable[..., object], *args: object
+    ) -> None:
+        super().__init__()
+        self._notifier = notifier
+        self._func = func
+        self._args = args
+
+    def run(self) -> None:
+        result, error = None, ""
+        try:
+            result = self._func(*self._args)
+        except Exception as e:
+            error = str(e)
+        try:
+            self._notifier.finished.emit(result, error)
+        except RuntimeError:
+            pass  # Application fermée pendant la tâche
+
+
+# Menus : (titre, entrées (texte, méthode de MainWindow) ; None = séparateur)
+_MENUS = (
+    (
+        "Fichier",
+        (
+            ("Charger un dataset", "_load_dataset"),
+            ("Recharger le dataset (nouvelles images)", "_reload_dataset"),
+            None,
+            ("Exporter les annotations", "_export_annotations"),
+            ("Importer des annotations", "_import_annotations"),
+            None,
+            ("Quitter", "close"),
+        ),
+    ),
+    (
+        "Outils",
+        (
+            ("Statistiques", "_show_stats"),
+            None,
+            (
+                "Exporter co-occurrence (depuis le dataset chargé)",
+                "_export_cooccurrence",
+            ),
+            ("Co-occurrence à partir d'un CSV", "_export_cooccurrence_from_csv"),
+            (
+                "Générer rapport exemples de localisation (HTML)",
+                "_export_localization_report",
+            ),
+        ),
+    ),
+    ("Aide", (("À propos", "_show_about"),)),
+)
+
+
+def _no_op() -> None:
+    pass
+
+
+_COOC_MSG_TMPL = "{title} :\n{csv}\n{heat}"
+
+
+def _cooccurrence_message(title: str, csv_path: object, png_path: object) -> str:
+    """Résumé d'un export de co-occurrence (png_path None : pas de heatmap)."""
+    heat = f"Heatmap :\n{png_path}" if png_path else "Heatmap : installez matplotlib."
+    return _COOC_MSG_TMPL.format(title=title, csv=csv_path, heat=heat)
+
+
+# Raccourcis clavier -> méthode de MainWindow
+_SHORTCUTS = (
+    ("Ctrl+S", "_save_current"),
+    ("Ctrl+Z", "_undo"),
+    ("Ctrl+Shift+Z", "_redo"),
+    ("Ctrl+E", "_export_annotations"),
+)
+
+
 class MainWindow(QMainWindow):
     """Fenêtre principale de l'application."""
 
+    # QKeySequence analysées une fois, partagées entre fenêtres
+    _shortcut_keys: dict[str, QKeySequence] = {}
+
     def __init__(self, data_manager: DataManager, current_user: str) -> None:
         super().__init__()
         self.data_manager = data_manager
         self.current_user = current_user
+        # Tâche de fond en cours : fenêtre modale + suite à donner (GUI)
+        self._task_notifier = _TaskNotifier()
+        self._task_notifier.finished.connect(self._on_task_finished)
+        self._task_progress: QProgressDialog | None = None
+        self._task_done: Callable[[object, str], None] | None = None
+        # Derniers dossiers utilisés par dialogue, conservés entre sessions
+        self._settings = QSettings("PAI2025", "OutilEtiquetageRadiographies")
         self.init_ui()
 
     def init_ui(self) -> None:
@@ -45,79 +150,97 @@ class MainWindow(QMainWindow):
         self.visualization_tab = VisualizationTab(self.data_manager, self.current_user)
         self.tab_widget.addTab(self.visualization_tab, "Visualisation")
 
-        self.annotations_tab = AnnotationsTab(self.data_manager, self.current_user)
-        self.tab_widget.addTab(self.annotations_tab, "Annotations")
+        # Onglet Annotations construit à la première ouverture (_maybe_build_tab)
+        self.annotations_tab: AnnotationsTab | None = None
+        # Raccourcis sans effet tant que l'onglet n'existe pas
+        self._save_fn = self._undo_fn = self._redo_fn = _no_op
+        self.tab_widget.addTab(QWidget(), "Annotations")
+        self._tab_factories = {1: self._build_annotations_tab}
+        self.tab_widget.currentChanged.connect(self._maybe_build_tab)
 
         self.create_menu_bar()
         self.setup_shortcuts()
 
         self.statusBar().showMessage(f"Connecté en tant que: {self.current_user}")
 
+    def _build_annotations_tab(self) -> AnnotationsTab:
+        tab = self.annotations_tab = AnnotationsTab(
+            self.data_manager, self.current_user
+        )
+        # Méthodes liées résolues une fois pour les raccourcis
+        self._save_fn = tab.save_annotations
+        self._undo_fn = tab.undo
+        self._redo_fn = tab.redo
+        return tab
+
+    def _maybe_build_tab(self, index: int) -> None:
+        """Remplace l'onglet provisoire index par le vrai au premier affichage."""
+        factory = self._tab_factories.pop(index, None)
+        if factory is None:
+            return
+        placeholder = self.tab_widget.widget(index)
+        title = self.tab_widget.tabText(index)
+        self.tab_widget.removeTab(index)
+        self.tab_widget.insertTab(index, factory(), title)
+        self.tab_widget.setCurrentIndex(index)
+        placeholder.deleteLater()
+
+    def _last_dir(self, key: str, name: str = "") -> str:
+        """Dossier de départ du dialogue key (suivi de name s'il est donné)."""
+        folder = str(self._settings.value(f"last_dir/{key}", ""))
+        return os.path.join(folder, name) if folder and name else folder or name
+
+    def _remember_dir(self, key: str, path: str, is_dir: bool = False) -> None:
+        folder = path if is_dir else os.path.dirname(path)
+        self._settings.setValue(f"last_dir/{key}", folder)
+
     def setup_shortcuts(self) -> None:
         """Raccourcis clavier (sauvegarde, undo, redo, export)."""
-        QShortcut(QKeySequence("Ctrl+S"), self).activated.connect(self._save_current)
-        QShortcut(QKeySequence("Ctrl+Z"), self).activated.connect(self._undo)
-        QShortcut(QKeySequence("Ctrl+Shift+Z"), self).activated.connect(self._redo)
-        QShortcut(QKeySequence("Ctrl+E"), self).activated.connect(
-            self._export_annotations
-        )
+        keys = MainWindow._shortcut_keys
+        for key, slot in _SHORTCUTS:
+            if key not in keys:
+                keys[key] = QKeySequence(key)
+            QShortcut(keys[key], self).activated.connect(getattr(self, slot))
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        """Termine les rendus de référence en cours avant de quitter."""
+        self.data_manager.close()
+        super().closeEvent(event)
 
     def _save_current(self) -> None:
-        if hasattr(self.annotations_tab, "save_annotations"):
-            self.annotations_tab.save_annotations()
+        self._save_fn()
         self.statusBar().showMessage("Annotations sauvegardées", 2000)
 
     def _undo(self) -> None:
-        if hasattr(self.annotations_tab, "undo"):
-            self.annotations_tab.undo()
+        self._undo_fn()
 
     def _redo(self) -> None:
-        if hasattr(self.annotations_tab, "redo"):
-            self.annotations_tab.redo()
+        self._redo_fn()
 
     def create_menu_bar(self) -> None:
         """Crée la barre de menu (Fichier, Outils, Aide)."""
         menubar = self.menuBar()
-
-        file_menu = menubar.addMenu("Fichier")
-        file_menu.addAction("Charger un dataset").triggered.connect(self._load_dataset)
-        file_menu.addAction(
-            "Recharger le dataset (nouvelles images)"
-        ).triggered.connect(self._reload_dataset)
-        file_menu.addSeparator()
-        file_menu.addAction("Exporter les annotations").triggered.connect(
-            self._export_annotations
-        )
-        file_menu.addAction("Importer des annotations").triggered.connect(
-            self._import_annotations
-        )
-        file_menu.addSeparator()
-        file_menu.addAction("Quitter").triggered.connect(self.close)
-
-        tools_menu = menubar.addMenu("Outils")
-        tools_menu.addAction("Statistiques").triggered.connect(self._show_stats)
-        tools_menu.addSeparator()
-        tools_menu.addAction(
-            "Exporter co-occurrence (depuis le dataset chargé)"
-        ).triggered.connect(self._export_cooccurrence)
-        tools_menu.addAction("Co-occurrence à partir d'un CSV").triggered.connect(
-            self._export_cooccurrence_from_csv
-        )
-        tools_menu.addAction(
-            "Générer rapport exemples de localisation (HTML)"
-        ).triggered.connect(self._export_localization_report)
-
-        help_menu = menubar.addMenu("Aide")
-        help_menu.addAction("À propos").triggered.connect(self._show_about)
+        for title, entries in _MENUS:
+            actions = []
+            for entry in entries:
+                action = QAction(self)
+                if entry is None:
+                    action.setSeparator(True)
+                else:
+                    text, slot = entry
+                    action.setText(text)
+                    action.triggered.connect(getattr(self, slot))
+                actions.append(action)
+            # Toutes les actions d'un menu ajoutées d'un coup
+            menubar.addMenu(title).addActions(actions)
 
     def _load_dataset(self) -> None:
         folder = QFileDialog.getExistingDirectory(
-            self, "Sélectionner le dossier du dataset"
+            self, "Sélectionner le dossier du dataset", self._last_dir("dataset")
         )
         if folder:
-            self.data_manager.load_dataset(folder)
-            self.visualization_tab.refresh_data()
-            self.statusBar().showMessage(f"Dataset chargé depuis: {folder}")
+            self._remember_dir("dataset", folder, is_dir=True)
+            self._start_loading(folder, lambda n: f"Dataset chargé depuis: {folder}")
 
     def _reload_dataset(self) -> None:
         if (
@@ -131,61 +254,127 @@ class MainWindow(QMainWindow):
             )
             return
         folder = str(self.data_manager.dataset_path)
-        self.data_manager.load_dataset(folder)
-        self.visualization_tab.refresh_data()
-        n = len(self.data_manager.images)
-        self.statusBar().showMessage(f"Dataset rechargé : {n} image(s)")
+        self._start_loading(folder, lambda n: f"Dataset rechargé : {n} image(s)")
+
+    def _run_in_background(
+        self,
+        title: str,
+        label: str,
+        done: Callable[[object, str], None],
+        func: Callable[..., object],
+        *args: object,
+    ) -> None:
+        """Lance func(*args) dans le QThreadPool ; done(résultat, erreur) dans le GUI."""
+        if self._task_progress is not None:
+            return
+        self._task_done = done
+        self.menuBar().setEnabled(False)
+        progress = QProgressDialog(label, "", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setCancelButton(None)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.show()
+        self._task_progress = progress
+        QThreadPool.globalInstance().start(
+            _BackgroundTask(self._task_notifier, func, *args)
+        )
+
+    def _on_task_finished(self, result: object, error: str) -> None:
+        if self._task_progress is not None:
+            self._task_progress.close()
+            self._task_progress = None
+        self.menuBar().setEnabled(True)
+        done, self._task_done = self._task_done, None
+        if done is not None:
+            done(result, error)
+
+    def _start_loading(self, folder: str, message: Callable[[int], str]) -> None:
+        """Charge le dataset en arrière-plan ; message(nb d'images) en fin."""
+
+        def done(_: object, error: str) -> None:
+            self.visualization_tab.refresh_data()
+            if error:
+                QMessageBox.critical(
+                    self, "Erreur", f"Erreur lors du chargement du dataset: {error}"
+                )
+                return
+            self.statusBar().showMessage(message(len(self.data_manager.images)))
+
+        self._run_in_background(
+            "Chargement",
+            "Chargement du dataset…",
+            done,
+            self.data_manager.load_dataset,
+            folder,
+        )
 
     def _export_annotations(self) -> None:
-        formats = ["JSON", "CSV", "COCO", "YOLO"]
-        format_dialog = QDialog(self)
-        format_dialog.setWindowTitle("Format d'export")
-        layout = QVBoxLayout()
-        layout.addWidget(QLabel("Format:"))
-        format_combo = QComboBox()
-        format_combo.addItems(formats)
-        layout.addWidget(format_combo)
-        buttons = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        # Format choisi par le filtre du dialogue : une seule fenêtre modale
+        filters = [
+            f"{f} Files (*.{f.lower()})" for f in ("JSON", "CSV", "COCO", "YOLO")
+        ]
+        last = str(self._settings.value("export_filter", filters[0]))
+        filename, selected = QFileDialog.getSaveFileName(
+            self,
+            "Exporter les annotations",
+            self._last_dir("export"),
+            ";;".join(filters),
+            last if last in filters else filters[0],
         )
-        buttons.accepted.connect(format_dialog.accept)
-        buttons.rejected.connect(format_dialog.reject)
-        layout.addWidget(buttons)
-        format_dialog.setLayout(layout)
-        if format_dialog.exec() != QDialog.DialogCode.Accepted:
+        if not filename:
             return
-        format_type = format_combo.currentText()
-        filename, _ = QFileDialog.getSaveFileName(
-            self,
-            f"Exporter en {format_type}",
-            "",
-            f"{format_type} Files (*.{format_type.lower()})",
+        format_type = (selected or filters[0]).split()[0]
+        self._settings.setValue("export_filter", selected or filters[0])
+        self._remember_dir("export", filename)
+
+        def done(_: object, error: str) -> None:
+            if error:
+                QMessageBox.critical(
+                    self, "Erreur", f"Erreur lors de l'export: {error}"
+                )
+            else:
+                QMessageBox.information(
+                    self, "Succès", f"Annotations exportées en {format_type}"
+                )
+
+        self._run_in_background(
+            "Export",
+            f"Export en {format_type}…",
+            done,
+            self.data_manager.export_annotations,
+            filename,
+            format_type,
         )
-        if filename:
-            self.data_manager.export_annotations(filename, format_type)
-            QMessageBox.information(
-                self, "Succès", f"Annotations exportées en {format_type}"
-            )
 
     def _import_annotations(self) -> None:
         filename, _ = QFileDialog.getOpenFileName(
             self,
             "Importer des annotations",
-            "",
+            self._last_dir("import"),
             "Fichiers supportés (*.json *.csv);;JSON (*.json);;CSV (*.csv)",
         )
-        if filename:
-            try:
-                self.data_manager.import_annotations(filename)
-                if hasattr(self.annotations_tab, "refresh_annotations"):
-                    self.annotations_tab.refresh_annotations()
-                QMessageBox.information(
-                    self, "Succès", "Annotations importées avec succès"
-                )
-            except Exception as e:
+        if not filename:
+            return
+        self._remember_dir("import", filename)
+
+        def done(_: object, error: str) -> None:
+            if error:
                 QMessageBox.critical(
-                    self, "Erreur", f"Erreur lors de l'import: {str(e)}"
+                    self, "Erreur", f"Erreur lors de l'import: {error}"
                 )
+                return
+            if self.annotations_tab is not None:
+                self.annotations_tab.refresh_annotations()
+            QMessageBox.information(self, "Succès", "Annotations importées avec succès")
+
+        self._run_in_background(
+            "Import",
+            "Import des annotations…",
+            done,
+            self.data_manager.import_annotations,
+            filename,
+        )
 
     def _show_stats(self) -> None:
         StatsDialog(self.data_manager, self).exec()
@@ -197,50 +386,75 @@ class MainWindow(QMainWindow):
             )
             return
         folder = QFileDialog.getExistingDirectory(
-            self, "Dossier pour enregistrer (CSV + heatmap)"
+            self, "Dossier pour enregistrer (CSV + heatmap)", self._last_dir("analysis")
         )
         if not folder:
             return
+        self._remember_dir("analysis", folder, is_dir=True)
         folder = Path(folder)
         csv_path = folder / "cooccurrence_pathologies.csv"
         png_path = folder / "cooccurrence_heatmap.png"
-        try:
+
+        def export() -> bool:
             analysis_export.export_cooccurrence_csv(
                 self.data_manager, str(csv_path), from_csv_only=True
             )
-            ok = analysis_export.export_cooccurrence_heatmap(
+            return analysis_export.export_cooccurrence_heatmap(
                 self.data_manager, str(png_path), from_csv_only=True
             )
-            msg = f"Matrice (depuis le CSV du dataset) :\n{csv_path}\n"
-            msg += f"Heatmap :\n{png_path}" if ok else "Heatmap : installez matplotlib."
-            QMessageBox.information(self, "Co-occurrence", msg)
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", str(e))
+
+        def done(ok: object, error: str) -> None:
+            if error:
+                QMessageBox.critical(self, "Erreur", error)
+                return
+            QMessageBox.information(
+                self,
+                "Co-occurrence",
+                _cooccurrence_message(
+                    "Matrice (depuis le CSV du dataset)",
+                    csv_path,
+                    png_path if ok else None,
+                ),
+            )
+
+        self._run_in_background(
+            "Co-occurrence", "Calcul de la co-occurrence…", done, export
+        )
 
     def _export_cooccurrence_from_csv(self) -> None:
         csv_path, _ = QFileDialog.getOpenFileName(
-            self, "Choisir le CSV", "", "CSV (*.csv);;Tous (*)"
+            self, "Choisir le CSV", self._last_dir("csv"), "CSV (*.csv);;Tous (*)"
         )
         if not csv_path:
             return
+        self._remember_dir("csv", csv_path)
         folder = QFileDialog.getExistingDirectory(
-            self, "Dossier pour enregistrer (CSV + heatmap)"
+            self, "Dossier pour enregistrer (CSV + heatmap)", self._last_dir("analysis")
         )
         if not folder:
             return
-        try:
-            csv_out, png_out = analysis_export.export_cooccurrence_from_csv_file(
-                csv_path, folder
-            )
-            msg = f"Matrice exportée :\n{csv_out}\n"
-            msg += (
-                f"Heatmap :\n{png_out}"
-                if png_out
-                else "Heatmap : installez matplotlib."
+        self._remember_dir("analysis", folder, is_dir=True)
+
+        def done(paths: object, error: str) -> None:
+            if error:
+                QMessageBox.critical(self, "Erreur", error)
+                return
+            csv_out, png_out = paths
+            QMessageBox.information(
+                self,
+                "Co-occurrence depuis CSV",
+                _cooccurrence_message("Matrice exportée", csv_out, png_out),
             )
-            QMessageBox.information(self, "Co-occurrence depuis CSV", msg)
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", str(e))
+
+        # Lecture du CSV + rendu matplotlib : hors du thread GUI
+        self._run_in_background(
+            "Co-occurrence",
+            "Calcul de la co-occurrence…",
+            done,
+            analysis_export.export_cooccurrence_from_csv_file,
+            csv_path,
+            folder,
+        )
 
     def _export_localization_report(self) -> None:
         if not self.data_manager.images:
@@ -249,20 +463,32 @@ class MainWindow(QMainWindow):
         path, _ = QFileDialog.getSaveFileName(
             self,
             "Enregistrer le rapport",
-            "exemples_localisation.html",
+            self._last_dir("report", "exemples_localisation.html"),
             "HTML (*.html)",
         )
         if not path:
             return
-        try:
-            analysis_export.export_localization_report(self.data_manager, path)
+        self._remember_dir("report", path)
+
+        def done(_: object, error: str) -> None:
+            if error:
+                QMessageBox.critical(self, "Erreur", error)
+                return
             QMessageBox.information(
                 self,
                 "Rapport",
                 f"Rapport généré :\n{path}\n\nOuvre-le dans un navigateur.",
             )
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", str(e))
+
+        # Attente des rendus de référence + heatmap : hors du thread GUI
+        self._run_in_background(
+            "Rapport",
+            "Génération du rapport…",
+            done,
+            lambda: analysis_export.export_localization_report(
+                self.data_manager, path, include_heatmap=True
+            ),
+        )
 
     def _show_about(self) -> None:
         QMessageBox.about(
@@ -277,7 +503,11 @@ class MainWindow(QMainWindow):
 
 def run() -> None:
     """Lance l'application Qt."""
+    # Avant QApplication : mouvements / molette regroupés sur toutes les plateformes
+    # (la mise à l'échelle haute densité est toujours active en Qt 6)
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_CompressHighFrequencyEvents)
     app = QApplication(sys.argv)
+    QPixmapCache.setCacheLimit(PIXMAP_CACHE_LIMIT_KB)
 
     auth_dialog = AuthDialog()
     if auth_dialog.exec() != QDialog.DialogCode.Accepted:
@@ -2,15 +2,16 @@
 Dialogue de statistiques (générales, par pathologie, par auteur).
 """
 
+from operator import itemgetter
 from typing import TYPE_CHECKING
 
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
 from PySide6.QtWidgets import (
     QDialog,
     QDialogButtonBox,
     QGroupBox,
     QLabel,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
@@ -19,6 +20,55 @@ if TYPE_CHECKING:
     from pai_2025_outil_etiquetage_radiographies.data_manager import DataManager
 
 
+class _CountsModel(QAbstractTableModel):
+    """Table (nom, nombre) lue directement dans une liste de tuples."""
+
+    def __init__(self, headers: tuple[str, str]) -> None:
+        super().__init__()
+        self._headers = headers
+        self._rows: list[tuple[str, int]] = []
+
+    def set_counts(self, counts: dict) -> None:
+        """Remplace les lignes (nombre décroissant) : un seul modelReset."""
+        self.beginResetModel()
+        self._rows = sorted(counts.items(), key=itemgetter(1), reverse=True)
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else 2
+
+    def data(
+        self,
+        index: QModelIndex,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> object:
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        return str(self._rows[index.row()][index.column()])
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> object:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+
+def _counts_view(model: _CountsModel) -> QTableView:
+    view = QTableView()
+    view.setModel(model)
+    view.horizontalHeader().setStretchLastSection(True)
+    return view
+
+
 class StatsDialog(QDialog):
     """Dialogue affichant les statistiques du dataset et des annotations."""
 
@@ -42,19 +92,15 @@ class StatsDialog(QDialog):
         layout.addWidget(general_group)
         pathology_group = QGroupBox("Annotations par pathologie")
         pathology_layout = QVBoxLayout()
-        self.pathology_table = QTableWidget()
-        self.pathology_table.setColumnCount(2)
-        self.pathology_table.setHorizontalHeaderLabels(["Pathologie", "Nombre"])
-        self.pathology_table.horizontalHeader().setStretchLastSection(True)
+        self.pathology_model = _CountsModel(("Pathologie", "Nombre"))
+        self.pathology_table = _counts_view(self.pathology_model)
         pathology_layout.addWidget(self.pathology_table)
         pathology_group.setLayout(pathology_layout)
         layout.addWidget(pathology_group)
         author_group = QGroupBox("Annotations par auteur")
         author_layout = QVBoxLayout()
-        self.author_table = QTableWidget()
-        self.author_table.setColumnCount(2)
-        self.author_table.setHorizontalHeaderLabels(["Auteur", "Nombre"])
-        self.author_table.horizontalHeader().setStretchLastSection(True)
+        self.author_model = _CountsModel(("Auteur", "Nombre"))
+        self.author_table = _counts_view(self.author_model)
         author_layout.addWidget(self.author_table)
         author_group.setLayout(author_layout)
         layout.addWidget(author_group)
@@ -73,17 +119,5 @@ class StatsDialog(QDialog):
             avg = stats["total_annotations"] / stats["annotated_images"]
             general_text += f"Moyenne d'annotations par image: {avg:.2f}"
         self.general_stats.setText(general_text)
-        pathology_stats = stats["annotations_by_pathology"]
-        self.pathology_table.setRowCount(len(pathology_stats))
-        for row, (pathology, count) in enumerate(
-            sorted(pathology_stats.items(), key=lambda x: x[1], reverse=True)
-        ):
-            self.pathology_table.setItem(row, 0, QTableWidgetItem(pathology))
-            self.pathology_table.setItem(row, 1, QTableWidgetItem(str(count)))
-        author_stats = stats["annotations_by_author"]
-        self.author_table.setRowCount(len(author_stats))
-        for row, (author, count) in enumerate(
-            sorted(author_stats.items(), key=lambda x: x[1], reverse=True)
-        ):
-            self.author_table.setItem(row, 0, QTableWidgetItem(author))
-            self.author_table.setItem(row, 1, QTableWidgetItem(str(count)))
+        self.pathology_model.set_counts(stats["annotations_by_pathology"])
+        self.author_model.set_counts(stats["annotations_by_author"])
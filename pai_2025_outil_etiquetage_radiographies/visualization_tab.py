@@ -2,11 +2,13 @@
 Onglet de visualisation des radiographies.
 """
 
+import math
+from collections import OrderedDict
 from typing import TYPE_CHECKING, Any
 
 import numpy as np
 from PIL import Image
-from PySide6.QtCore import QDate, Qt
+from PySide6.QtCore import QDate, QObject, QRunnable, Qt, QThreadPool, QTimer, Signal
 from PySide6.QtGui import QImage, QPixmap, QWheelEvent
 from PySide6.QtWidgets import (
     QCheckBox,
@@ -28,10 +30,194 @@ from PySide6.QtWidgets import (
 if TYPE_CHECKING:
     from pai_2025_outil_etiquetage_radiographies.data_manager import DataManager
 
+# Délai après le dernier mouvement de slider avant le rendu lissé (ms)
+_SMOOTH_DELAY_MS = 150
+# Intervalle minimal entre deux rendus d'aperçu pendant un glissement (~60 Hz)
+_PREVIEW_INTERVAL_MS = 16
+# Niveaux de la pyramide de réductions (1, 1/2, 1/4, 1/8)
+_PYRAMID_LEVELS = 4
+# Nombre d'images décodées gardées en mémoire pour la navigation Précédent/Suivant
+_DECODE_CACHE_SIZE = 16
+# Rendus lissés (zoom <= 1) gardés pour le pixmap de base courant
+_SCALED_CACHE_SIZE = 8
+# Champs du panneau patient (libellé, clé de métadonnées)
+_PATIENT_FIELDS = (
+    ("Fichier", "filename"),
+    ("Patient ID", "patient_id"),
+    ("Date", "date"),
+    ("Sexe", "sex"),
+    ("Âge", "age"),
+    ("Vue", "view"),
+)
+
+
+def _decode(image_path: str, level: int = 0) -> tuple[tuple[int, int], int, np.ndarray]:
+    """Décode en niveaux de gris : (forme pleine résolution, niveau obtenu, pixels)."""
+    with Image.open(image_path) as im:
+        width, height = im.size
+        if level and im.format == "JPEG":
+            # Le JPEG se décode directement à 1/2, 1/4 ou 1/8 (mise à l'échelle DCT)
+            scale = 2**level
+            im.draft("L", (-(-width // scale), -(-height // scale)))
+            level = round(math.log2(width / im.width))
+        else:
+            level = 0
+        # convert() recopierait une image déjà en L ; asarray ne recopie pas
+        # les octets exportés par Pillow (tableau en lecture seule)
+        if im.mode != "L":
+            im = im.convert("L")
+        return (height, width), level, np.asarray(im)
+
+
+class _Pyramid:
+    """Réductions par boîte d'une image (niveau -> pixels), construites à la demande."""
+
+    def __init__(
+        self, image_path: str, shape: tuple[int, int], levels: dict[int, np.ndarray]
+    ) -> None:
+        self.image_path = image_path
+        self.shape = shape
+        self.levels = levels
+
+    @classmethod
+    def decode(cls, image_path: str, level: int = 0) -> "_Pyramid":
+        shape, level, pixels = _decode(image_path, level)
+        return cls(image_path, shape, {level: pixels})
+
+    def level(self, level: int) -> np.ndarray:
+        """Pixels du niveau demandé, réduit depuis le plus fin déjà disponible."""
+        if level not in self.levels:
+            finer = [k for k in self.levels if k < level]
+            if finer:
+                src = max(finer)
+            else:
+                # Seul un décodage réduit (JPEG) est en cache : pleine résolution
+                src = 0
+                self.levels[0] = _decode(self.image_path)[2]
+            reduced = Image.fromarray(self.levels[src]).reduce(2 ** (level - src))
+            self.levels[level] = np.asarray(reduced)
+        return self.levels[level]
+
+
+# Chemin -> pyramide, du plus ancien au plus récent
+_decoded: OrderedDict[str, _Pyramid] = OrderedDict()
+
+
+def _remember(pyramid: _Pyramid) -> None:
+    """Range une pyramide dans le cache LRU (évince la plus ancienne)."""
+    _decoded[pyramid.image_path] = pyramid
+    if len(_decoded) > _DECODE_CACHE_SIZE:
+        _decoded.popitem(last=False)
+
+
+def _decoded_pyramid(image_path: str, level: int = 0) -> _Pyramid:
+    """Pyramide de l'image (décodée au niveau demandé au besoin), via un cache LRU."""
+    pyramid = _decoded.get(image_path)
+    if pyramid is not None:
+        _decoded.move_to_end(image_path)
+        return pyramid
+    pyramid = _Pyramid.decode(image_path, level)
+    _remember(pyramid)
+    return pyramid
+
+
+class _DecodeJob(QRunnable):
+    """Décodage anticipé d'une image hors du thread GUI."""
+
+    def __init__(self, prefetcher: "_Prefetcher", image_path: str) -> None:
+        super().__init__()
+        self._prefetcher = prefetcher
+        self._image_path = image_path
+
+    def run(self) -> None:
+        try:
+            pyramid = _Pyramid.decode(self._image_path)
+        except Exception as e:
+            print(f"Erreur préchargement {self._image_path}: {e}")
+            pyramid = None
+        try:
+            self._prefetcher.decoded.emit(self._image_path, pyramid)
+        except RuntimeError:
+            pass  # Application fermée pendant le décodage
+
+
+class _Prefetcher(QObject):
+    """Décode les images voisines dans un pool dédié, rangées dans le cache LRU."""
+
+    decoded = Signal(str, object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._pending: set[str] = set()
+        # Pool propre : limiter le pool global brimerait l'onglet Annotations
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self.decoded.connect(self._store)
+
+    def request(self, image_path: str) -> None:
+        if image_path in _decoded or image_path in self._pending:
+            return
+        self._pending.add(image_path)
+        self._pool.start(_DecodeJob(self, image_path))
+
+    def _store(self, image_path: str, pyramid: _Pyramid | None) -> None:
+        self._pending.discard(image_path)
+        if pyramid is not None and image_path not in _decoded:
+            _remember(pyramid)
+
+
+_prefetcher: _Prefetcher | None = None
+
+
+def _image_prefetcher() -> _Prefetcher:
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = _Prefetcher()
+    return _prefetcher
+
+
+def _gray_color_table(lut: np.ndarray) -> list[int]:
+    """Table de couleurs Qt (0xFFvvvvvv) pour une table 8 bits de niveaux de gris."""
+    return (0xFF000000 | lut.astype(np.uint32) * 0x010101).tolist()
+
+
+class _SmoothScaleJob(QRunnable):
+    """Réduction lissée du QImage de base hors du thread GUI (QImage uniquement)."""
+
+    def __init__(
+        self,
+        viewer: "ImageViewer",
+        token: int,
+        image: QImage,
+        pixels: np.ndarray,
+        size: tuple[int, int],
+    ) -> None:
+        super().__init__()
+        self._viewer = viewer
+        self._token = token
+        self._image = image
+        # Garde en vie le tampon que le QImage lit sans copie
+        self._pixels = pixels
+        self._size = size
+
+    def run(self) -> None:
+        scaled = self._image.scaled(
+            *self._size,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+        try:
+            self._viewer.smooth_scaled.emit(self._token, scaled)
+        except RuntimeError:
+            pass  # Visionneuse détruite pendant la réduction
+
 
 class ImageViewer(QScrollArea):
     """Widget pour afficher et manipuler les images (zoom, luminosité, contraste)."""
 
+    # (jeton de la demande, image réduite) émis depuis le QThreadPool
+    smooth_scaled = Signal(int, QImage)
+
     def __init__(self) -> None:
         super().__init__()
         self.image_label = QLabel()
@@ -39,56 +225,172 @@ class ImageViewer(QScrollArea):
         self.image_label.setScaledContents(False)
         self.setWidget(self.image_label)
         self.setWidgetResizable(True)
-        self.original_image: Image.Image | None = None
-        self.current_image: np.ndarray | None = None
+        # Image courante (réductions décodées à la demande, partagées avec le cache)
+        self._pyramid: _Pyramid | None = None
         self.zoom_factor = 1.0
         self.brightness = 0.0
         self.contrast = 1.0
+        # Mêmes réglages en centièmes entiers (slider) : table en arithmétique entière
+        self._brightness_pct = 0
+        self._contrast_pct = 100
+        # Table de couleurs Indexed8 : niveau de gris -> gris ajusté (contraste, luminosité)
+        self._color_table = _gray_color_table(np.arange(256, dtype=np.uint8))
+        # Pixels bruts du niveau de pyramide courant, source du pixmap de base
+        self._base: np.ndarray | None = None
+        self._base_level: int | None = None
+        self._base_qimage: QImage | None = None
+        self._base_pixmap: QPixmap | None = None
+        # Jeton de la dernière demande d'affichage : les rendus lissés plus
+        # anciens arrivent trop tard et sont ignorés
+        self._scale_token = 0
+        self._smooth_size: tuple[int, int] | None = None
+        self.smooth_scaled.connect(self._on_smooth_scaled)
+        # Taille affichée -> rendu lissé du pixmap de base, vidé à chaque reconstruction
+        self._scaled_cache: dict[tuple[int, int], QPixmap] = {}
+        self._smooth_timer = QTimer(self)
+        self._smooth_timer.setSingleShot(True)
+        self._smooth_timer.setInterval(_SMOOTH_DELAY_MS)
+        self._smooth_timer.timeout.connect(self._rescale)
+        self._pending_rebuild = False
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(_PREVIEW_INTERVAL_MS)
+        self._render_timer.timeout.connect(self._render_preview)
 
     def load_image(self, image_path: str) -> None:
         """Charge une image (niveau de gris)."""
         try:
-            self.original_image = Image.open(image_path).convert("L")
-            self.current_image = np.array(self.original_image)
+            # Zoom arrière : un JPEG est décodé directement au niveau affiché
+            self._pyramid = _decoded_pyramid(image_path, self._pyramid_level())
+            self._base_level = None
             self.update_display()
         except Exception as e:
             print(f"Erreur lors du chargement de l'image: {e}")
 
     def update_display(self) -> None:
         """Met à jour l'affichage avec contraste, luminosité et zoom."""
-        if self.current_image is None:
+        if self._pyramid is None:
             return
-        img = self.current_image.copy().astype(np.float32)
-        img = img * self.contrast + self.brightness
-        img = np.clip(img, 0, 255).astype(np.uint8)
-        height, width = img.shape
+        self._render_timer.stop()
+        self._pending_rebuild = False
+        self._rebuild_base_qimage()
+        self._rescale()
+
+    def _pyramid_level(self) -> int:
+        """Niveau de réduction le plus proche du zoom courant (sans descendre dessous)."""
+        level = int(-math.log2(max(self.zoom_factor, 1e-3)))
+        return max(0, min(_PYRAMID_LEVELS - 1, level))
+
+    def _rebuild_base_qimage(self) -> None:
+        """Reconstruit le pixmap de base (contraste, luminosité) au niveau du zoom."""
+        self._base_level = self._pyramid_level()
+        # Pixels bruts en Indexed8 (sans copie) : la table de couleurs applique
+        # contraste et luminosité pendant la conversion en pixmap, faite de toute façon.
+        self._base = self._pyramid.level(self._base_level)
+        height, width = self._base.shape
         q_image = QImage(
-            img.data.tobytes(), width, height, width, QImage.Format.Format_Grayscale8
+            self._base.data,
+            width,
+            height,
+            self._base.strides[0],
+            QImage.Format.Format_Indexed8,
         )
-        pixmap = QPixmap.fromImage(q_image)
-        scaled_pixmap = pixmap.scaled(
-            int(width * self.zoom_factor),
-            int(height * self.zoom_factor),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation,
+        q_image.setColorTable(self._color_table)
+        # Jamais modifié ensuite : partageable avec un rendu lissé en cours
+        self._base_qimage = q_image
+        self._base_pixmap = QPixmap.fromImage(q_image)
+        self._scaled_cache.clear()
+        self._scale_token += 1
+
+    def _rescale(self, smooth: bool = True) -> None:
+        """Applique le zoom : aperçu rapide immédiat, rendu lissé hors du thread GUI."""
+        if self._pyramid is None:
+            return
+        if self._base_level != self._pyramid_level():
+            self._rebuild_base_qimage()
+        height, width = self._pyramid.shape
+        size = (int(width * self.zoom_factor), int(height * self.zoom_factor))
+        self._scale_token += 1
+        # Un rendu lissé déjà calculé sert aussi d'aperçu
+        cached = self._scaled_cache.get(size)
+        if cached is not None:
+            self._show(cached)
+            return
+        if size == (self._base_pixmap.width(), self._base_pixmap.height()):
+            self._show(self._base_pixmap)
+            return
+        self._show(
+            self._base_pixmap.scaled(
+                *size,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.FastTransformation,
+            )
         )
-        self.image_label.setPixmap(scaled_pixmap)
-        self.image_label.resize(scaled_pixmap.size())
+        if smooth:
+            self._smooth_size = size
+            QThreadPool.globalInstance().start(
+                _SmoothScaleJob(
+                    self, self._scale_token, self._base_qimage, self._base, size
+                )
+            )
+
+    def _on_smooth_scaled(self, token: int, image: QImage) -> None:
+        if token != self._scale_token:
+            return  # Zoom ou réglages modifiés depuis la demande
+        scaled_pixmap = QPixmap.fromImage(image)
+        if self.zoom_factor <= 1.0:
+            if len(self._scaled_cache) >= _SCALED_CACHE_SIZE:
+                del self._scaled_cache[next(iter(self._scaled_cache))]
+            self._scaled_cache[self._smooth_size] = scaled_pixmap
+        self._show(scaled_pixmap)
+
+    def _show(self, pixmap: QPixmap) -> None:
+        self.image_label.setPixmap(pixmap)
+        self.image_label.resize(pixmap.size())
+
+    def _rebuild_lut(self) -> None:
+        """Précalcule la réponse contraste/luminosité des 256 niveaux de gris."""
+        # v * c / 100 + b * 2.55, en entiers (division entière unique, exacte)
+        x = np.arange(256, dtype=np.int32) * self._contrast_pct
+        x += 255 * self._brightness_pct
+        self._color_table = _gray_color_table(
+            np.clip(x // 100, 0, 255).astype(np.uint8)
+        )
+
+    def _preview(self, rebuild: bool) -> None:
+        """Planifie un rendu rapide (un par trame), puis lissé au relâchement."""
+        self._pending_rebuild |= rebuild
+        if not self._render_timer.isActive():
+            self._render_timer.start()
+        self._smooth_timer.start()
+
+    def _render_preview(self) -> None:
+        """Rendu rapide regroupant les changements de sliders reçus depuis le dernier."""
+        if self._pyramid is None:
+            return
+        if self._pending_rebuild:
+            self._rebuild_base_qimage()
+        self._pending_rebuild = False
+        self._rescale(smooth=False)
 
     def set_zoom(self, factor: float) -> None:
         """Définit le facteur de zoom (0.1 à 5.0)."""
         self.zoom_factor = max(0.1, min(5.0, factor))
-        self.update_display()
+        self._preview(rebuild=False)
 
     def set_brightness(self, value: int) -> None:
         """Définit la luminosité (-100 à 100)."""
         self.brightness = value * 2.55
-        self.update_display()
+        self._brightness_pct = value
+        self._rebuild_lut()
+        self._preview(rebuild=True)
 
     def set_contrast(self, value: float) -> None:
         """Définit le contraste (0.5 à 2.0)."""
         self.contrast = value
-        self.update_display()
+        self._contrast_pct = round(value * 100)
+        self._rebuild_lut()
+        self._preview(rebuild=True)
 
     def wheelEvent(self, event: QWheelEvent) -> None:
         """Zoom avec Ctrl + molette."""
@@ -199,25 +501,9 @@ class VisualizationTab(QWidget):
         filters_layout = QVBoxLayout()
         filters_layout.addWidget(QLabel("Pathologie:"))
         self.pathology_filter = QComboBox()
+        # Même ordre que les masques de bits de filter_images
         self.pathology_filter.addItems(
-            [
-                "Toutes",
-                "Atelectasis",
-                "Cardiomegaly",
-                "Effusion",
-                "Infiltration",
-                "Mass",
-                "Nodule",
-                "Pneumonia",
-                "Pneumothorax",
-                "Consolidation",
-                "Edema",
-                "Emphysema",
-                "Fibrosis",
-                "Pleural_Thickening",
-                "Hernia",
-                "No Finding",
-            ]
+            ["Toutes", *self.data_manager.PATHOLOGY_ORDER, "No Finding"]
         )
         filters_layout.addWidget(self.pathology_filter)
         filters_layout.addWidget(QLabel("Sexe:"))
@@ -303,20 +589,24 @@ class VisualizationTab(QWidget):
         self.image_viewer.load_image(image_path)
         metadata = self.data_manager.get_image_metadata(image_path)
         annotations = self.data_manager.get_image_annotations(image_path)
-        info_text = f"Fichier: {metadata.get('filename', 'N/A')}\n"
-        info_text += f"Patient ID: {metadata.get('patient_id', 'N/A')}\n"
-        info_text += f"Date: {metadata.get('date', 'N/A')}\n"
-        info_text += f"Sexe: {metadata.get('sex', 'N/A')}\n"
-        info_text += f"Âge: {metadata.get('age', 'N/A')}\n"
-        info_text += f"Vue: {metadata.get('view', 'N/A')}\n"
-        info_text += (
-            f"Pathologies: {', '.join(metadata.get('pathologies', [])) or 'Aucune'}\n"
+        lines = [
+            f"{label}: {metadata.get(key, 'N/A')}" for label, key in _PATIENT_FIELDS
+        ]
+        lines.append(
+            f"Pathologies: {', '.join(metadata.get('pathologies', [])) or 'Aucune'}"
         )
-        info_text += f"Annotations: {len(annotations)}"
-        self.patient_info.setText(info_text)
+        lines.append(f"Annotations: {len(annotations)}")
+        # Texte brut : pas de détection ni de mise en page rich text
+        self.patient_info.setPlainText("\n".join(lines))
         self.image_info_label.setText(
             f"Image {self.current_filter_index + 1}/{len(self.filtered_images)}"
         )
+        # Précédente / suivante décodées pendant que l'utilisateur regarde celle-ci
+        count = len(self.filtered_images)
+        prefetcher = _image_prefetcher()
+        for step in (1, -1):
+            neighbour = self.filtered_images[(self.current_filter_index + step) % count]
+            prefetcher.request(neighbour)
 
     def previous_image(self) -> None:
         """Image précédente."""
@@ -341,15 +631,9 @@ class VisualizationTab(QWidget):
         ):
             return
         image_path = self.filtered_images[self.current_filter_index]
-        try:
-            idx = next(
-                i
-                for i, img in enumerate(self.data_manager.images)
-                if str(img) == image_path
-            )
+        idx = self.data_manager.get_image_index(image_path)
+        if idx is not None:
             self.data_manager.current_image_index = idx
-        except StopIteration:
-            pass
         parent = self.parent()
         while parent and not hasattr(parent, "tab_widget"):
             parent = parent.parent()
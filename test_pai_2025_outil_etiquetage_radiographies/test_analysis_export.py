@@ -0,0 +1,270 @@
+"""Tests pour l'export des analyses (co-occurrence)."""
+
+import csv
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from pai_2025_outil_etiquetage_radiographies import analysis_export
+from pai_2025_outil_etiquetage_radiographies.analysis_export import PATHOLOGY_ORDER
+from pai_2025_outil_etiquetage_radiographies.data_manager import DataManager
+
+
+def _idx(pathology: str) -> int:
+    return PATHOLOGY_ORDER.index(pathology)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Cache disque des matrices isolé par test."""
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(analysis_export, "_CACHE_DIR", cache)
+    analysis_export._cooccurrence_from_csv_stamped.cache_clear()
+    return cache
+
+
+@pytest.fixture
+def data_entry_csv(tmp_path):
+    """CSV type Data_Entry (Finding Labels multi-valeurs, ligne dupliquée)."""
+    csv_path = tmp_path / "Data_Entry_2017.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Image Index", "Finding Labels", "Patient ID"])
+        w.writerow(["a.png", "Atelectasis|Effusion", "P001"])
+        w.writerow(["a.png", "Effusion", "P001"])
+        w.writerow(["b.png", "Effusion | Mass", "P002"])
+        w.writerow(["c.png", "No Finding", "P003"])
+    return csv_path
+
+
+@pytest.fixture
+def pathology_csv(tmp_path):
+    """CSV d'annotations exporté (colonnes Image / Pathology)."""
+    csv_path = tmp_path / "annotations.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Image", "Pathology", "X", "Y"])
+        w.writerow(["a.png", "Nodule", 1, 2])
+        w.writerow(["a.png", "Mass", 3, 4])
+        w.writerow(["b.png", "Nodule", 5, 6])
+    return csv_path
+
+
+def test_cooccurrence_from_csv_finding_labels(data_entry_csv):
+    """Co-occurrence depuis Finding Labels (une image compte une fois)."""
+    labels, matrix = analysis_export._cooccurrence_from_csv(str(data_entry_csv))
+    assert labels == PATHOLOGY_ORDER
+    assert matrix.shape == (14, 14)
+    assert matrix[_idx("Atelectasis")][_idx("Atelectasis")] == 1
+    assert matrix[_idx("Effusion")][_idx("Effusion")] == 2
+    assert matrix[_idx("Atelectasis")][_idx("Effusion")] == 1
+    assert matrix[_idx("Effusion")][_idx("Mass")] == 1
+    assert matrix[_idx("Atelectasis")][_idx("Mass")] == 0
+    assert sum(sum(row) for row in matrix) == 8
+
+
+def test_cooccurrence_from_csv_small_chunks(data_entry_csv, monkeypatch):
+    """Lecture par blocs : même résultat, image à cheval comptée une fois."""
+    _, expected = analysis_export._cooccurrence_from_csv(str(data_entry_csv))
+    monkeypatch.setattr(analysis_export, "_CSV_CHUNK_ROWS", 1)
+    _, matrix = analysis_export._cooccurrence_from_csv(str(data_entry_csv))
+    assert np.array_equal(matrix, expected)
+
+
+@pytest.fixture
+def padded_header_csv(tmp_path):
+    """CSV dont les noms de colonnes sont entourés d'espaces."""
+    csv_path = tmp_path / "padded.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow([" Image Index ", " Finding Labels ", " Patient ID "])
+        w.writerow(["a.png", "Atelectasis|Effusion", "P001"])
+        w.writerow(["b.png", "Effusion", "P002"])
+    return csv_path
+
+
+@pytest.fixture
+def scattered_csv(tmp_path):
+    """CSV dont les lignes d'une même image ne se suivent pas."""
+    csv_path = tmp_path / "scattered.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Image Index", "Finding Labels"])
+        w.writerows(
+            [["a.png", "Mass"], ["b.png", "Nodule"], ["a.png", "Mass"]]
+            + [["c.png", "Edema"], ["b.png", "Mass"], ["d.png", "Mass"]]
+        )
+    return csv_path
+
+
+def test_cooccurrence_from_csv_image_split_across_chunks(scattered_csv, monkeypatch):
+    """Image revenant dans un bloc ultérieur : comptée une seule fois."""
+    _, expected = analysis_export._cooccurrence_from_csv(str(scattered_csv))
+    assert expected[_idx("Mass")][_idx("Mass")] == 3
+    assert expected[_idx("Mass")][_idx("Nodule")] == 1
+    monkeypatch.setattr(analysis_export, "_CSV_CHUNK_ROWS", 1)
+    _, matrix = analysis_export._cooccurrence_from_csv(str(scattered_csv))
+    assert np.array_equal(matrix, expected)
+
+
+def test_cooccurrence_from_csv_parallel(data_entry_csv, monkeypatch):
+    """Découpage en plages d'octets (pool de processus) : même résultat."""
+    _, expected = analysis_export._cooccurrence_from_csv(str(data_entry_csv))
+    monkeypatch.setattr(analysis_export, "_PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(analysis_export, "_PARALLEL_RANGE_BYTES", 16)
+    monkeypatch.setattr(analysis_export.os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(analysis_export, "duckdb", None)
+    _, matrix = analysis_export._cooccurrence_from_csv(str(data_entry_csv))
+    assert np.array_equal(matrix, expected)
+
+
+def test_cooccurrence_from_csv_parallel_scattered(scattered_csv, monkeypatch):
+    """Pool de processus et DuckDB : image répartie sur des plages non voisines."""
+    pytest.importorskip("duckdb")
+    monkeypatch.setattr(analysis_export, "_PARALLEL_MIN_BYTES", 0)
+    _, expected = analysis_export._cooccurrence_from_csv(str(scattered_csv))
+    monkeypatch.setattr(analysis_export, "_PARALLEL_RANGE_BYTES", 16)
+    monkeypatch.setattr(analysis_export.os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(analysis_export, "duckdb", None)
+    _, matrix = analysis_export._cooccurrence_from_csv(str(scattered_csv))
+    assert expected[_idx("Mass")][_idx("Mass")] == 3
+    assert np.array_equal(matrix, expected)
+
+
+@pytest.mark.parametrize(
+    "fixture", ["data_entry_csv", "pathology_csv", "padded_header_csv"]
+)
+def test_cooccurrence_from_csv_duckdb(fixture, request, monkeypatch):
+    """Chemin DuckDB (optionnel) : même résultat que la lecture pandas."""
+    pytest.importorskip("duckdb")
+    csv_path = str(request.getfixturevalue(fixture))
+    _, expected = analysis_export._cooccurrence_from_csv(csv_path)
+    monkeypatch.setattr(analysis_export, "_PARALLEL_MIN_BYTES", 0)
+    _, matrix = analysis_export._cooccurrence_from_csv(csv_path)
+    assert np.array_equal(matrix, expected)
+    assert matrix.sum() > 0
+
+
+def test_cooccurrence_from_csv_duckdb_error_falls_back(data_entry_csv, monkeypatch):
+    """Erreur DuckDB : repli sur la lecture pandas, même résultat."""
+    duckdb = pytest.importorskip("duckdb")
+    _, expected = analysis_export._cooccurrence_from_csv(str(data_entry_csv))
+
+    def fail(*_):
+        raise duckdb.Error("boom")
+
+    monkeypatch.setattr(analysis_export, "_PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(analysis_export, "_mask_histogram_duckdb", fail)
+    monkeypatch.setattr(analysis_export.os, "cpu_count", lambda: 1)
+    _, matrix = analysis_export._cooccurrence_from_csv(str(data_entry_csv))
+    assert np.array_equal(matrix, expected)
+
+
+def test_cached_cooccurrence_from_disk(data_entry_csv, cache_dir, monkeypatch):
+    """Deuxième session : matrice relue depuis le .npz, sans relire le CSV."""
+    labels, expected = analysis_export._cached_cooccurrence_from_csv(
+        str(data_entry_csv)
+    )
+    assert len(list(cache_dir.glob("cooc-*.npz"))) == 1
+    analysis_export._cooccurrence_from_csv_stamped.cache_clear()
+
+    def fail(_):
+        raise AssertionError("CSV relu")
+
+    monkeypatch.setattr(analysis_export, "_cooccurrence_from_csv", fail)
+    cached_labels, matrix = analysis_export._cached_cooccurrence_from_csv(
+        str(data_entry_csv)
+    )
+    assert cached_labels == labels
+    assert np.array_equal(matrix, expected)
+
+
+def test_cached_cooccurrence_versioned_and_bounded(
+    data_entry_csv, pathology_csv, cache_dir, monkeypatch
+):
+    """Clé dépendante de la version ; nombre de fichiers du cache borné."""
+    analysis_export._cached_cooccurrence_from_csv(str(data_entry_csv))
+    (old,) = cache_dir.glob("cooc-*.npz")
+    analysis_export._cooccurrence_from_csv_stamped.cache_clear()
+    monkeypatch.setattr(analysis_export, "_COOC_CACHE_VERSION", -1)
+    monkeypatch.setattr(analysis_export, "_COOC_CACHE_FILES", 1)
+    analysis_export._cached_cooccurrence_from_csv(str(data_entry_csv))
+    assert list(cache_dir.glob("cooc-*.npz")) != [old]
+    analysis_export._cached_cooccurrence_from_csv(str(pathology_csv))
+    assert len(list(cache_dir.glob("cooc-*.npz"))) == 1
+
+
+def test_cooccurrence_from_csv_pathology_column(pathology_csv):
+    """Co-occurrence depuis une colonne Pathology (une ligne par annotation)."""
+    _, matrix = analysis_export._cooccurrence_from_csv(str(pathology_csv))
+    assert matrix[_idx("Nodule")][_idx("Nodule")] == 2
+    assert matrix[_idx("Mass")][_idx("Nodule")] == 1
+    assert matrix[_idx("Mass")][_idx("Mass")] == 1
+
+
+def test_cooccurrence_from_empty_csv(tmp_path):
+    """Un CSV vide donne une matrice nulle 14x14."""
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_text("", encoding="utf-8")
+    labels, matrix = analysis_export._cooccurrence_from_csv(str(csv_path))
+    assert len(labels) == 14
+    assert all(v == 0 for row in matrix for v in row)
+
+
+def test_export_cooccurrence_from_csv_file(data_entry_csv, tmp_path):
+    """L'export écrit la matrice CSV (en-tête + 14 lignes)."""
+    csv_out, _ = analysis_export.export_cooccurrence_from_csv_file(
+        str(data_entry_csv), str(tmp_path / "out")
+    )
+    with open(csv_out, encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == [""] + PATHOLOGY_ORDER
+    assert len(rows) == 15
+    assert rows[1 + _idx("Effusion")][1 + _idx("Effusion")] == "2"
+
+
+def test_heatmap_png_pillow():
+    """Le rendu Pillow produit un PNG (mis en cache pour une même matrice)."""
+    labels = tuple(PATHOLOGY_ORDER)
+    matrix = tuple(tuple(10 if i == j else 0 for j in range(14)) for i in range(14))
+    png = analysis_export._heatmap_png_pillow(labels, matrix, "Test")
+    assert png.startswith(b"\x89PNG")
+    img = Image.open(io.BytesIO(png))
+    assert img.width > 14 * analysis_export._HEATMAP_CELL
+    assert analysis_export._heatmap_png_pillow(labels, matrix, "Test") is png
+
+
+def test_export_localization_report(tmp_path):
+    """Le rapport HTML liste au plus 8 images triées par pathologie."""
+    dm = DataManager()
+    dm.reference_images_dir = tmp_path / "refs"
+    nodule_dir = dm.reference_images_dir / "Nodule"
+    nodule_dir.mkdir(parents=True)
+    for i in range(10):
+        (nodule_dir / f"img{i:02d}_annotated.png").touch()
+    (nodule_dir / "other.png").touch()
+    report = tmp_path / "report" / "report.html"
+    analysis_export.export_localization_report(dm, str(report))
+    html = report.read_text(encoding="utf-8")
+    assert "<h2>Nodule</h2>" in html
+    assert "<h2>Mass</h2>" not in html
+    assert html.count("<div class='cell'>") == 8
+    assert "img00_annotated.png" in html and "img08_annotated.png" not in html
+    assert "other.png" not in html
+    assert html.index("img00_") < html.index("img07_")
+    assert "../refs/Nodule/img00_annotated.png".replace("/", os.sep) in html
+    assert html.endswith("</body></html>")
+
+
+def test_export_localization_report_inline_heatmap(tmp_path):
+    """Avec include_heatmap, la heatmap est intégrée en data URI PNG."""
+    dm = DataManager()
+    dm.reference_images_dir = tmp_path / "refs"
+    report = tmp_path / "report.html"
+    analysis_export.export_localization_report(dm, str(report), include_heatmap=True)
+    html = report.read_text(encoding="utf-8")
+    assert "src='data:image/png;base64,iVBORw0KGgo" in html
+    assert not list(tmp_path.glob("*.png"))
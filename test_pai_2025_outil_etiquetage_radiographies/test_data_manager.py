@@ -1,12 +1,20 @@
 """Tests pour le DataManager."""
 
 import csv
+import json
+import pickle
 from pathlib import Path
 
 import pytest
 from PIL import Image
+from PySide6.QtGui import QColor
 
-from pai_2025_outil_etiquetage_radiographies.data_manager import DataManager
+from pai_2025_outil_etiquetage_radiographies import data_manager
+from pai_2025_outil_etiquetage_radiographies.data_manager import (
+    AnnotationTable,
+    DataManager,
+    MetadataTable,
+)
 
 
 @pytest.fixture
@@ -66,6 +74,26 @@ def test_load_dataset_discovers_images(temp_dataset):
     assert stems == {"img1", "img2"}
     assert len(dm.metadata) == 2
     assert len(dm.annotations) == 2
+    ids = [dm.get_image_metadata(p)["patient_id"] for p in dm.images]
+    assert ids == ["P000000", "P000001"]
+
+
+def test_load_dataset_nested_and_mixed_case(temp_dataset):
+    """Sous-dossiers parcourus, extensions sans casse, chemins str triés."""
+    sub = temp_dataset / "sub"
+    sub.mkdir()
+    (sub / "img3.JPG").write_bytes(b"")
+    (sub / "img4.Jpeg").write_bytes(b"")
+    (sub / "notes.txt").write_text("x", encoding="utf-8")
+    dm = DataManager()
+    dm.load_dataset(str(temp_dataset))
+    assert [Path(p).name for p in dm.images] == [
+        "img1.png",
+        "img2.png",
+        "img3.JPG",
+        "img4.Jpeg",
+    ]
+    assert all(isinstance(p, str) for p in dm.images)
 
 
 def test_load_dataset_with_csv(temp_dataset_with_csv):
@@ -79,6 +107,39 @@ def test_load_dataset_with_csv(temp_dataset_with_csv):
         assert "pathologies" in meta or "patient_id" in meta
 
 
+def test_load_dataset_images_dir_csv_in_parent(temp_dataset_with_csv):
+    """Dossier images/ : CSV cherchés dans le parent, images seulement dans images/."""
+    images_dir = temp_dataset_with_csv / "images"
+    images_dir.mkdir()
+    for name in ("a.png", "b.png"):
+        (temp_dataset_with_csv / name).rename(images_dir / name)
+    (temp_dataset_with_csv / "outside.png").write_bytes(b"")
+    dm = DataManager()
+    dm.load_dataset(str(images_dir))
+    assert [Path(p).name for p in dm.images] == ["a.png", "b.png"]
+    meta = dm.get_image_metadata(str(images_dir / "a.png"))
+    assert meta["patient_id"] == "P001"
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "Image Index,Finding Label,Bbox [x,y,w,h],,,\na.png,Mass,1.5,2,3,4,,,\n",
+        'Image Index,Finding Label,"Bbox [x,y,w,h]"\na.png,Mass,"1.5,2,3,4"\n',
+    ],
+)
+def test_load_bbox_from_csv(temp_dataset_with_csv, content):
+    """BBox NIH : en-tête non quoté (4 colonnes) ou colonne unique "x,y,w,h"."""
+    bbox_csv = temp_dataset_with_csv / "bbox.csv"
+    bbox_csv.write_text(content, encoding="utf-8")
+    dm = DataManager()
+    dm.load_dataset(str(temp_dataset_with_csv))
+    dm._load_bbox_from_csv(bbox_csv)
+    (ann,) = dm.annotations[str(temp_dataset_with_csv / "a.png")]
+    assert (ann["x"], ann["y"], ann["width"], ann["height"]) == (1.5, 2.0, 3.0, 4.0)
+    assert ann["pathology"] == "Mass"
+
+
 def test_get_statistics_empty():
     """get_statistics sur un DataManager vide."""
     dm = DataManager()
@@ -100,6 +161,39 @@ def test_get_statistics_after_load(temp_dataset):
     assert stats["total_annotations"] == 0
 
 
+def test_get_statistics_incremental(temp_dataset):
+    """Les statistiques suivent ajouts, modifications et suppressions."""
+    dm = DataManager()
+    dm.load_dataset(str(temp_dataset))
+    first, second = dm.images
+    dm.add_annotation(first, {"pathology": "Mass", "author": "alice"})
+    dm.add_annotation(second, {"pathology": "Mass"})
+    stats = dm.get_statistics()
+    assert stats["annotated_images"] == 2 and stats["total_annotations"] == 2
+    assert stats["annotations_by_pathology"] == {"Mass": 2}
+    assert stats["annotations_by_author"] == {"alice": 1, "Unknown": 1}
+    dm.update_annotation(second, 0, {"pathology": "Nodule"})
+    dm.delete_annotation(first, 0)
+    stats = dm.get_statistics()
+    assert stats["annotated_images"] == 1 and stats["total_annotations"] == 1
+    assert stats["annotations_by_pathology"] == {"Nodule": 1}
+    assert stats["annotations_by_author"] == {"Unknown": 1}
+    dm.annotations = {first: [{"pathology": "Edema"}]}
+    assert dm.get_statistics()["annotations_by_pathology"] == {"Edema": 1}
+
+
+def test_annotation_table_pickle_roundtrip():
+    """AnnotationTable se sérialise (pickle) et se relit comme un dict, observable à nouveau."""
+    table = AnnotationTable({"a.png": [{"pathology": "Mass"}]})
+    table.watch()
+    restored = pickle.loads(pickle.dumps(table))
+    assert type(restored) is AnnotationTable and restored == table
+    touched = restored.watch()
+    touched.clear()
+    restored["b.png"] = []
+    assert touched == {"b.png"}
+
+
 def test_get_current_image_empty():
     """get_current_image sans images retourne None."""
     dm = DataManager()
@@ -115,6 +209,18 @@ def test_get_current_image(temp_dataset):
     assert dm.get_current_image() == str(dm.images[0])
 
 
+def test_get_image_index(temp_dataset):
+    """get_image_index retrouve la position d'un chemin, même après rechargement."""
+    dm = DataManager()
+    dm.load_dataset(str(temp_dataset))
+    assert dm.get_image_index(str(dm.images[1])) == 1
+    assert dm.get_image_index(dm.images[0]) == 0
+    assert dm.get_image_index("absent.png") is None
+    (temp_dataset / "img0.png").write_bytes((temp_dataset / "img1.png").read_bytes())
+    dm.load_dataset(str(temp_dataset))
+    assert dm.get_image_index(str(temp_dataset / "img1.png")) == 1
+
+
 def test_get_image_metadata(temp_dataset):
     """get_image_metadata retourne un dict (défaut ou depuis CSV)."""
     dm = DataManager()
@@ -155,6 +261,104 @@ def test_add_annotation(temp_dataset):
     assert annos[0]["x"] == 10
 
 
+def test_save_annotations_roundtrip(temp_dataset, tmp_path):
+    """save_annotations écrit annotations.db ; un JSON ancien format reste lu."""
+    dm = DataManager()
+    dm.annotations_dir = tmp_path / "ann"
+    dm.reference_images_dir = tmp_path / "refs"
+    dm.load_dataset(str(temp_dataset))
+    first, second = dm.images
+    ann = {
+        "type": "box",
+        "x": 10,
+        "y": 20.5,
+        "width": 30,
+        "height": 40,
+        "pathology": "Mass",
+        "color": QColor(1, 2, 3, 4),
+        "note": "ok",
+    }
+    dm.add_annotation(first, ann)
+    dm.save_annotations(first)
+    (dm.annotations_dir / f"{Path(second).stem}.json").write_text(
+        json.dumps({"annotations": [{"x": 1, "color": {"r": 5, "g": 6, "b": 7}}]}),
+        encoding="utf-8",
+    )
+    reloaded = DataManager()
+    reloaded.annotations_dir = dm.annotations_dir
+    reloaded.load_dataset(str(temp_dataset))
+    (got,) = reloaded.get_image_annotations(first)
+    assert got == ann
+    assert type(got["x"]) is int and got["color"].alpha() == 4
+    (legacy,) = reloaded.get_image_annotations(second)
+    assert legacy["x"] == 1 and legacy["color"] == QColor(5, 6, 7)
+    assert not list(dm.annotations_dir.glob(f"{Path(first).stem}.json"))
+
+
+def test_save_annotations_skips_unchanged_render(temp_dataset, tmp_path, monkeypatch):
+    """Sauvegarde sans changement : l'image de référence n'est pas redessinée."""
+    dm = DataManager()
+    dm.annotations_dir = tmp_path / "ann"
+    dm.reference_images_dir = tmp_path / "refs"
+    dm.load_dataset(str(temp_dataset))
+    path = dm.images[0]
+    box = {"type": "box", "x": 1, "y": 1, "width": 5, "height": 5}
+    dm.add_annotation(path, {**box, "pathology": "Mass"})
+    calls = []
+    render = data_manager._render_reference
+    monkeypatch.setattr(
+        data_manager, "_render_reference", lambda *a: calls.append(a) or render(*a)
+    )
+    dm.save_annotations(path)
+    dm.save_annotations(path)
+    assert len(calls) == 1
+    dm.get_image_annotations(path)[0]["x"] = 2
+    dm.save_annotations(path)
+    dm.close()
+    (dm.reference_images_dir / "Mass" / "img1_annotated.png").unlink()
+    dm.save_annotations(path)
+    dm.close()
+    assert len(calls) == 3
+
+
+def test_save_all_annotations(temp_dataset, tmp_path):
+    """save_all_annotations enregistre tout et génère les images de référence."""
+    dm = DataManager()
+    dm.annotations_dir = tmp_path / "ann"
+    dm.reference_images_dir = tmp_path / "refs"
+    dm.load_dataset(str(temp_dataset))
+    box = {"type": "box", "x": 1, "y": 1, "width": 5, "height": 5}
+    for path, pathology in zip(dm.images, ["Mass", "Nodule"]):
+        dm.add_annotation(path, {**box, "pathology": pathology})
+    dm.save_all_annotations()
+    assert (dm.reference_images_dir / "Mass" / "img1_annotated.png").exists()
+    assert (dm.reference_images_dir / "Nodule" / "img2_annotated.png").exists()
+    reloaded = DataManager()
+    reloaded.annotations_dir = dm.annotations_dir
+    reloaded.load_dataset(str(temp_dataset))
+    for path in dm.images:
+        assert reloaded.get_image_annotations(path) == dm.get_image_annotations(path)
+
+
+def test_get_reference_images_follows_edits(temp_dataset):
+    """Références par pathologie : ordre des annotations, image exclue, modifications."""
+    dm = DataManager()
+    dm.load_dataset(str(temp_dataset))
+    first, second = dm.images
+    box = {"type": "box", "x": 1, "y": 1, "width": 5, "height": 5}
+    dm.add_annotation(first, {**box, "pathology": "Mass"})
+    dm.add_annotation(second, {**box, "pathology": "Mass"})
+    assert [p for p, _ in dm.get_reference_images_for_pathology("Mass")] == [
+        first,
+        second,
+    ]
+    refs = dm.get_reference_images_for_pathology("Mass", exclude_path=first)
+    assert [p for p, _ in refs] == [second]
+    dm.update_annotation(second, 0, {**box, "pathology": "Nodule"})
+    assert [p for p, _ in dm.get_reference_images_for_pathology("Mass")] == [first]
+    assert [p for p, _ in dm.get_reference_images_for_pathology("Nodule")] == [second]
+
+
 def test_filter_images_all(temp_dataset):
     """filter_images sans critères retourne toutes les images."""
     dm = DataManager()
@@ -171,6 +375,31 @@ def test_filter_images_pathology(temp_dataset_with_csv):
     assert len(filtered) >= 1
 
 
+def test_filter_images_sex_view_age(temp_dataset_with_csv):
+    """filter_images combine sexe, vue (sans casse) et âge."""
+    dm = DataManager()
+    dm.load_dataset(str(temp_dataset_with_csv))
+    a, b = (str(temp_dataset_with_csv / n) for n in ("a.png", "b.png"))
+    assert dm.filter_images({"sex": "m"}) == [a]
+    assert dm.filter_images({"view": "ap"}) == [b]
+    assert dm.filter_images({"age_min": 50}) == [b]
+    assert dm.filter_images({"age_max": 50, "sex": "F"}) == []
+
+
+def test_metadata_table_mapping():
+    """MetadataTable se lit et s'écrit comme un dict chemin -> métadonnées."""
+    table = MetadataTable()
+    table["x.png"] = {"sex": "M", "pathologies": ["Mass"], "custom": 1}
+    table.extend(["y.png"], {"sex": ["F"], "pathologies": [["Nodule"]]})
+    assert table["x.png"] == {"sex": "M", "pathologies": ["Mass"], "custom": 1}
+    assert list(table) == ["x.png", "y.png"]
+    table["x.png"]["pathologies"].append("Edema")
+    assert table.pathologies("x.png") == ["Mass"]
+    del table["x.png"]
+    assert "x.png" not in table and len(table) == 1
+    assert table.get("y.png") == {"sex": "F", "pathologies": ["Nodule"]}
+
+
 def test_export_import_json(temp_dataset, tmp_path):
     """Export JSON puis import restaure les annotations."""
     dm = DataManager()
@@ -226,6 +455,20 @@ def test_get_cooccurrence_data(temp_dataset):
     assert all(len(row) == 14 for row in matrix)
 
 
+def test_get_cooccurrence_data_cached(temp_dataset_with_csv):
+    """Le résultat (métadonnées) est mis en cache et invalidé au rechargement."""
+    dm = DataManager()
+    dm.load_dataset(str(temp_dataset_with_csv))
+    labels, matrix = dm.get_cooccurrence_data(from_csv_only=True)
+    idx = labels.index("Atelectasis")
+    assert matrix[idx][idx] == 1
+    matrix[idx][idx] = 99
+    _, cached = dm.get_cooccurrence_data(from_csv_only=True)
+    assert cached[idx][idx] == 1
+    dm.load_dataset(str(temp_dataset_with_csv))
+    assert dm._cooccurrence_cache is None
+
+
 def test_import_csv(temp_dataset, tmp_path):
     """Import depuis un CSV restaure les annotations."""
     dm = DataManager()